@@ -0,0 +1 @@
+# Empty file - creates package
@@ -0,0 +1,109 @@
+"""Benchmark - vectorized LSB embedding vs the original per-pixel loop,
+capacity/throughput of k-LSB embedding and tile-parallel scaling
+
+Run from the project root:
+    python -m benchmarks.bench_lsb
+"""
+
+import time
+from functools import partial
+
+import numpy as np
+
+from core.payload import HEADER_BITS
+from core.steganography import Steganography
+
+SIZES = [(64, 64), (256, 256), (512, 512), (1024, 1024)]
+FILL = 0.5  # fraction of the channel values carrying message bits
+K_SIZE = (2000, 3000)
+WORKERS = [1, 2, 4, 8]
+
+
+def legacy_encode_lsb(img, bits):
+    """Original triple-loop implementation, kept as the reference"""
+    data_index = 0
+    for i in range(img.shape[0]):
+        for j in range(img.shape[1]):
+            for k in range(3):
+                if data_index < len(bits):
+                    img[i, j, k] = (img[i, j, k] & 0xFE) | int(bits[data_index])
+                    data_index += 1
+                else:
+                    return img
+    return img
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_loop(rng):
+    print(f"{'size':>11} {'bits':>10} {'loop (s)':>10} {'numpy (s)':>10} {'speedup':>9}")
+    
+    for h, w in SIZES:
+        cover = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        n_bits = int(cover.size * FILL)
+        bits = rng.integers(0, 2, n_bits, dtype=np.uint8)
+        
+        legacy, t_loop = timed(legacy_encode_lsb, cover.copy(), bits)
+        fast, t_numpy = timed(Steganography._encode_lsb, cover.copy(), bits)
+        
+        if not np.array_equal(legacy, fast):
+            raise AssertionError(f"Output mismatch at {w}x{h}")
+        
+        print(f"{w:>5}x{h:<5} {n_bits:>10,} {t_loop:>10.4f} {t_numpy:>10.4f} "
+              f"{t_loop / t_numpy:>8.0f}x")
+
+
+def bench_k(rng):
+    h, w = K_SIZE
+    cover = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    print(f"\nk-LSB on {w}x{h}, payload filling the cover")
+    print(f"{'k':>2} {'capacity (MB)':>14} {'encode (s)':>11} {'decode (s)':>11} {'MB/s':>7}")
+    
+    for k in range(1, 5):
+        payload = rng.bytes(((cover.size - HEADER_BITS) * k) // 8)
+        result, t_encode = timed(partial(Steganography.encode_array, bits_per_channel=k),
+                                 cover, payload)
+        decoded, t_decode = timed(Steganography.decode_array, result['image'])
+        
+        if decoded['data'] != payload:
+            raise AssertionError(f"Round trip failed for k={k}")
+        
+        size_mb = len(payload) / 1e6
+        print(f"{k:>2} {size_mb:>14.2f} {t_encode:>11.4f} {t_decode:>11.4f} "
+              f"{size_mb / t_encode:>7.1f}")
+
+
+def bench_workers(rng):
+    h, w = K_SIZE
+    cover = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    payload = rng.bytes((cover.size - HEADER_BITS) // 8)
+    print(f"\nThread-pool tiles on {w}x{h}, full LSB_MATCH payload")
+    print(f"{'workers':>7} {'encode (s)':>11} {'decode (s)':>11}")
+    
+    reference = None
+    for workers in WORKERS:
+        encode = partial(Steganography.encode_array, method='LSB_MATCH',
+                         rng=np.random.default_rng(1), workers=workers)
+        result, t_encode = timed(encode, cover, payload)
+        decoded, t_decode = timed(partial(Steganography.decode_array, workers=workers),
+                                  result['image'])
+        
+        if reference is None:
+            reference = result['image']
+        if decoded['data'] != payload or not np.array_equal(result['image'], reference):
+            raise AssertionError(f"Output differs with {workers} workers")
+        print(f"{workers:>7} {t_encode:>11.4f} {t_decode:>11.4f}")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    bench_loop(rng)
+    bench_k(rng)
+    bench_workers(rng)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark - embedding efficiency and speed of Hamming matrix embedding
+against plain LSB
+
+Efficiency is payload bits per changed channel value; plain LSB sits near
+2, a (1, 2^p - 1, p) code near p * 2^p / (2^p - 1).
+
+Run from the project root:
+    python -m benchmarks.bench_matrix
+"""
+
+import time
+
+import numpy as np
+
+from core.steganography import Steganography, MAX_MATRIX_P
+
+SIZE = (2000, 3000)
+P_VALUES = range(2, MAX_MATRIX_P + 1)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def report(name, cover, stego, n_bits, t_encode):
+    changes = np.count_nonzero(cover != stego)
+    print(f"{name:>8} {n_bits / 8e6:>10.2f} {changes:>11,} {n_bits / changes:>10.2f} "
+          f"{t_encode:>11.4f} {n_bits / 8e6 / t_encode:>7.1f}")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    h, w = SIZE
+    cover = rng.integers(0, 256, (h, w, 3), dtype=np.uint8).reshape(-1)
+    print(f"Payload filling a {w}x{h} cover")
+    print(f"{'method':>8} {'bits (MB)':>10} {'changes':>11} {'bits/chg':>10} "
+          f"{'encode (s)':>11} {'MB/s':>7}")
+    
+    bits = rng.integers(0, 2, cover.size, dtype=np.uint8)
+    stego, t_encode = timed(Steganography._encode_lsb, cover.copy(), bits)
+    report('LSB', cover, stego, bits.size, t_encode)
+    
+    for p in P_VALUES:
+        n = (1 << p) - 1
+        bits = rng.integers(0, 2, cover.size // n * p, dtype=np.uint8)
+        stego, t_encode = timed(Steganography._encode_matrix, cover.copy(), bits, p)
+        report(f"p={p}", cover, stego, bits.size, t_encode)
+
+
+if __name__ == "__main__":
+    main()
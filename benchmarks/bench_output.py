@@ -0,0 +1,55 @@
+"""Benchmark - write time and bytes per lossless output backend
+
+Run from the project root, optionally with a cover image to scale:
+    python -m benchmarks.bench_output [image_path]
+"""
+
+import sys
+import time
+import cv2
+import numpy as np
+
+from core.image_io import ImageIO, OUTPUT_FORMATS
+
+SIZES = [(480, 640), (1080, 1920), (3000, 4000)]
+PNG_LEVELS = [0, 1, 3, 6, 9]
+SAMPLE = "encrypted_images/man-stroking-his-old-dog_encrypted_1.png"
+
+
+def backends():
+    for level in PNG_LEVELS:
+        yield f"png-{level}", ImageIO.output_params('png', level)
+    for fmt in OUTPUT_FORMATS:
+        if fmt != 'png':
+            yield fmt, ImageIO.output_params(fmt)
+
+
+def load_cover(path):
+    img = cv2.imread(path)
+    if img is None:
+        # Smooth noise compresses roughly like a photo, unlike white noise
+        img = np.random.default_rng(0).integers(0, 256, (256, 256, 3), dtype=np.uint8)
+        img = cv2.GaussianBlur(img, (9, 9), 0)
+    return img
+
+
+def main():
+    cover = load_cover(sys.argv[1] if len(sys.argv) > 1 else SAMPLE)
+    print(f"{'size':>11} {'backend':>8} {'write (ms)':>11} {'KB':>9} {'ratio':>6}")
+    
+    for h, w in SIZES:
+        img = cv2.resize(cover, (w, h), interpolation=cv2.INTER_CUBIC)
+        # Every stego image carries LSB noise, include it in the measurement
+        img ^= np.random.default_rng(1).integers(0, 2, img.shape, dtype=np.uint8)
+        
+        for name, (ext, params) in backends():
+            start = time.perf_counter()
+            data = ImageIO.encode(img, ext, params)
+            elapsed = (time.perf_counter() - start) * 1000
+            
+            print(f"{w:>5}x{h:<5} {name:>8} {elapsed:>11.1f} {len(data) / 1024:>9.0f} "
+                  f"{img.nbytes / len(data):>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ SUPPORTED_FORMATS = [
     ("PNG files", "*.png"),
     ("JPEG files", "*.jpg *.jpeg"),
     ("BMP files", "*.bmp"),
+    ("WebP files", "*.webp"),
+    ("TIFF files", "*.tif *.tiff"),
     ("All files", "*.*")
 ]
 
@@ -21,7 +23,8 @@ MIN_PASSWORD_LENGTH = 4
 STEGO_ALGORITHMS = {
     'LSB': 'Least Significant Bit (Standard)',
     'PVD': 'Pixel Value Differencing (Advanced)',
-    'LSB_MATCH': 'LSB Matching (Histogram Preserved)'
+    'LSB_MATCH': 'LSB Matching (Histogram Preserved)',
+    'MATRIX': 'Matrix Embedding (Fewest Changes)'
 }
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
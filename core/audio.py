@@ -0,0 +1,191 @@
+"""Audio carrier - LSB embedding in PCM WAV files through a memory map"""
+
+import os
+import shutil
+import struct
+
+import numpy as np
+
+from core.payload import PayloadHeader, BitReader, HEADER_BITS, FLAG_BINARY
+from core.steganography import Steganography, MAX_BITS_PER_CHANNEL
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+EMBED_CHUNK_SAMPLES = 1 << 22  # samples gathered per embedding pass
+COPY_CHUNK_BYTES = 16 * 1024 * 1024
+
+
+class AudioCarrier:
+    """LSB embedding in the low byte of every PCM sample, without loading the file"""
+    
+    @staticmethod
+    def encode_message(audio_path: str, message, output_path: str, method='LSB',
+                       bits_per_channel: int = 1, workers: int = 1,
+                       compression: str = 'none') -> dict:
+        """Encode a text message, binary payload or PayloadStream into a PCM WAV file
+        
+        The samples are mapped copy-on-write, so only the pages holding
+        payload bits are ever copied into memory; the output takes those
+        from the mapping and streams the rest straight from the carrier.
+        Header and payload follow the image layout, one payload unit per
+        sample in place of one per channel value.
+        """
+        try:
+            if method != 'LSB':
+                raise ValueError("Audio carriers support LSB only")
+            k = bits_per_channel
+            if k not in range(1, MAX_BITS_PER_CHANNEL + 1):
+                raise ValueError(f"bits_per_channel must be 1-{MAX_BITS_PER_CHANNEL}")
+            if os.path.abspath(output_path) == os.path.abspath(audio_path):
+                raise ValueError("Output path must differ from the carrier")
+            
+            layout = AudioCarrier._layout(audio_path)
+            payload, flags = Steganography._to_payload(message)
+            header = PayloadHeader.pack('LSB', len(payload), flags, k, compression)
+            n_bits = len(payload) * 8
+            touched = HEADER_BITS + -(-n_bits // k)
+            if touched > layout['samples']:
+                raise ValueError(f"Message too large. Max {(layout['samples'] - HEADER_BITS) * k // 8} bytes")
+            
+            mapped = AudioCarrier._map(audio_path, layout, 'c')
+            samples = mapped[::layout['sample_width']]
+            samples[:HEADER_BITS] = Steganography._encode_lsb(samples[:HEADER_BITS],
+                                                              Steganography._to_bits(header))
+            
+            # Strided sample views are gathered, embedded and scattered back in chunks
+            reader = BitReader(payload)
+            chunk_bits = EMBED_CHUNK_SAMPLES * k
+            for offset in range(0, n_bits, chunk_bits):
+                bits = reader.read(min(chunk_bits, n_bits - offset))
+                start = HEADER_BITS + offset // k
+                stop = start + -(-bits.size // k)
+                samples[start:stop] = Steganography._encode_lsb(samples[start:stop], bits, k,
+                                                                workers=workers)
+            
+            AudioCarrier._write(audio_path, output_path, layout, mapped,
+                                touched * layout['sample_width'])
+            
+            return {
+                'success': True,
+                'output_path': output_path,
+                'message_length': len(message) if isinstance(message, str) else len(payload),
+                'samples': layout['samples'],
+                'capacity_used': (HEADER_BITS + n_bits) / (layout['samples'] * k) * 100,
+                'method': 'LSB'
+            }
+        
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def decode_message(audio_path: str, workers: int = 1) -> dict:
+        """Decode a message written by encode_message, reading only the payload samples"""
+        try:
+            header, chunks = AudioCarrier.stream_payload(audio_path, workers)
+            data = b"".join(chunks)
+            message = None if header['flags'] & FLAG_BINARY else data.decode('utf-8')
+            
+            return {
+                'success': True,
+                'message': message,
+                'data': data,
+                'length': len(data) if message is None else len(message),
+                'method': header['method'],
+                'compression': header['compression']
+            }
+        
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def stream_payload(audio_path: str, workers: int = 1) -> tuple:
+        """Read the header now and return (header, generator of payload byte chunks)
+        
+        Chunks are extracted from the mapping as the generator is consumed,
+        e.g. straight into StreamEncryption.decrypt.
+        """
+        layout = AudioCarrier._layout(audio_path)
+        if layout['samples'] < HEADER_BITS:
+            raise ValueError("No valid message found")
+        samples = AudioCarrier._map(audio_path, layout, 'r')[::layout['sample_width']]
+        
+        header = PayloadHeader.unpack(np.packbits(samples[:HEADER_BITS] & 1).tobytes())
+        if header is None or header['method'] != 'LSB':
+            raise ValueError("No valid message found")
+        
+        k, n_bits = header['param'], header['length'] * 8
+        if HEADER_BITS + -(-n_bits // k) > samples.size:
+            raise ValueError("Payload length exceeds audio capacity")
+        
+        def chunks():
+            # Every full chunk holds a whole number of bytes
+            chunk_bits = EMBED_CHUNK_SAMPLES * k
+            for offset in range(0, n_bits, chunk_bits):
+                count = min(chunk_bits, n_bits - offset)
+                start = HEADER_BITS + offset // k
+                bits = Steganography._extract_lsb(samples[start:start + -(-count // k)], k, workers)
+                yield np.packbits(bits[:count]).tobytes()
+        
+        return header, chunks()
+    
+    @staticmethod
+    def _layout(audio_path: str) -> dict:
+        """Walk the RIFF chunks for the PCM format and the data chunk position"""
+        file_size = os.path.getsize(audio_path)
+        with open(audio_path, 'rb') as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:] != b'WAVE':
+                raise ValueError("Not a RIFF/WAVE file")
+            
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    raise ValueError("WAV file has no data chunk")
+                chunk_id, size = struct.unpack('<4sI', chunk)
+                if chunk_id == b'data':
+                    break
+                if chunk_id == b'fmt ':
+                    fmt = f.read(size)
+                    f.seek(size % 2, os.SEEK_CUR)
+                else:
+                    f.seek(size + size % 2, os.SEEK_CUR)
+            data_offset = f.tell()
+        
+        if fmt is None or len(fmt) < 16:
+            raise ValueError("WAV file has no format chunk")
+        format_tag, channels, rate, _, block_align, _ = struct.unpack('<HHIIHH', fmt[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            format_tag = struct.unpack('<H', fmt[24:26])[0]
+        if format_tag != WAVE_FORMAT_PCM or not channels or block_align % channels:
+            raise ValueError("Only uncompressed PCM WAV files are supported")
+        
+        sample_width = block_align // channels
+        data_size = min(size, file_size - data_offset)
+        return {
+            'data_offset': data_offset,
+            'data_size': data_size,
+            'sample_width': sample_width,
+            'samples': data_size // sample_width,
+            'channels': channels,
+            'rate': rate
+        }
+    
+    @staticmethod
+    def _map(audio_path: str, layout: dict, mode: str) -> np.memmap:
+        """Byte map of the whole samples of the data chunk"""
+        length = layout['samples'] * layout['sample_width']
+        if length == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(audio_path, dtype=np.uint8, mode=mode,
+                         offset=layout['data_offset'], shape=(length,))
+    
+    @staticmethod
+    def _write(audio_path: str, output_path: str, layout: dict, mapped, modified: int):
+        """Copy the carrier to output_path, its first modified data bytes taken from mapped"""
+        with open(audio_path, 'rb') as src, open(output_path, 'wb') as dst:
+            dst.write(src.read(layout['data_offset']))
+            for start in range(0, modified, COPY_CHUNK_BYTES):
+                dst.write(mapped[start:min(start + COPY_CHUNK_BYTES, modified)].tobytes())
+            src.seek(layout['data_offset'] + modified)
+            shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
@@ -0,0 +1,65 @@
+"""Payload compression - shrinks data before it is encrypted and embedded"""
+
+import bz2
+import lzma
+import zlib
+
+COMPRESS_MIN_BYTES = 64  # below this the codec framing outweighs any saving
+
+# Codec picked by 'auto' for payloads up to each size: zlib has the least
+# framing for short messages, bz2 wins on mid-sized text and lzma on large
+# inputs where its slower compression pays off
+AUTO_CODECS = [
+    (64 * 1024, 'zlib'),
+    (1024 * 1024, 'bz2'),
+    (None, 'lzma')
+]
+
+CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 9), zlib.decompress),
+    'bz2': (lambda data: bz2.compress(data, 9), bz2.decompress),
+    'lzma': (lzma.compress, lzma.decompress)
+}
+
+
+class PayloadCompression:
+    """Stdlib compression with automatic codec choice"""
+    
+    @staticmethod
+    def choose(size: int) -> str:
+        """Codec 'auto' uses for a payload of size bytes"""
+        if size < COMPRESS_MIN_BYTES:
+            return 'none'
+        return next(codec for limit, codec in AUTO_CODECS if limit is None or size <= limit)
+    
+    @staticmethod
+    def compress(data, codec: str = 'auto') -> tuple:
+        """Compress data, returns (codec used, bytes)
+        
+        Falls back to 'none' when the codec does not make data smaller, so
+        the result is never larger than the input.
+        """
+        data = bytes(data)
+        if codec == 'auto':
+            codec = PayloadCompression.choose(len(data))
+        if codec == 'none':
+            return 'none', data
+        if codec not in CODECS:
+            raise ValueError(f"Unknown compression codec: {codec}")
+        
+        packed = CODECS[codec][0](data)
+        if len(packed) >= len(data):
+            return 'none', data
+        return codec, packed
+    
+    @staticmethod
+    def decompress(data, codec: str) -> bytes:
+        """Undo compress() given the codec it reported"""
+        if codec in (None, 'none'):
+            return bytes(data)
+        if codec not in CODECS:
+            raise ValueError(f"Unknown compression codec: {codec}")
+        try:
+            return CODECS[codec][1](bytes(data))
+        except (zlib.error, OSError, lzma.LZMAError, EOFError):
+            raise ValueError(f"Corrupted {codec} payload")
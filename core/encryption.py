@@ -2,9 +2,173 @@
 
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
 import base64
+import hashlib
+import hmac
 import os
+import struct
+import threading
+import time
+
+from core.payload import PayloadStream
+
+PBKDF2_ITERATIONS = 100000
+PBKDF2_ITERATION_RANGE = (1000, 10_000_000)  # accepted from an envelope
+SCRYPT_PARAMS = (15, 8, 1)  # log2 n, r, p
+SCRYPT_LOG2_N_RANGE = (10, 22)
+SCRYPT_R_RANGE = (1, 32)
+SCRYPT_P_RANGE = (1, 16)
+SCRYPT_MAX_MEMORY = 1 << 30  # bytes, 128 * r * n
+CALIBRATION_PROBE_SECONDS = 0.02
+SALT_SIZE = 16
+NONCE_SIZE = 12
+TAG_SIZE = 16
+KEY_CACHE_ENTRIES = 32
+KEY_CACHE_MAX_AGE = 300  # seconds
+
+# Binary envelope: version, cipher id, KDF id, KDF parameter (big-endian),
+# then salt, nonce and AEAD ciphertext. Everything before the nonce is
+# authenticated as associated data. Legacy messages are base64 text, whose
+# first byte can never be the version byte.
+ENVELOPE_VERSION = 0x02
+_ENVELOPE = struct.Struct(">BBBI")
+ENVELOPE_OVERHEAD = _ENVELOPE.size + SALT_SIZE + NONCE_SIZE + TAG_SIZE
+
+# Streaming envelope: version, cipher id, KDF id, KDF parameter and chunk
+# size, then salt and a nonce prefix; the whole header is associated data
+# for every chunk. Chunk i is sealed under prefix + i + a last-chunk flag,
+# so chunks cannot be reordered, dropped or truncated unnoticed.
+STREAM_VERSION = 0x03
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_MAX_CHUNK_SIZE = 16 * 1024 * 1024  # bounds what decrypt buffers before authenticating
+STREAM_NONCE_PREFIX_SIZE = NONCE_SIZE - 5
+_STREAM_HEADER = struct.Struct(">BBBII")
+STREAM_HEADER_SIZE = _STREAM_HEADER.size + SALT_SIZE + STREAM_NONCE_PREFIX_SIZE
+_STREAM_NONCE_SUFFIX = struct.Struct(">IB")
+
+# Multi-recipient envelope: version, cipher id and recipient count, then one
+# slot per password (KDF id, KDF parameter, salt, nonce and the content key
+# wrapped under that password's key), then the content nonce and
+# ciphertext. Each slot authenticates the header and its own fields; the
+# content authenticates everything before its nonce.
+MULTI_VERSION = 0x04
+_MULTI_HEADER = struct.Struct(">BBH")
+_SLOT = struct.Struct(">BI")
+CONTENT_KEY_SIZE = 32
+SLOT_SIZE = _SLOT.size + SALT_SIZE + NONCE_SIZE + CONTENT_KEY_SIZE + TAG_SIZE
+MAX_RECIPIENTS = 0xFFFF
+RECIPIENT_WORKERS = 8
+
+CIPHERS = {
+    'aes-gcm': (1, AESGCM),
+    'chacha20-poly1305': (2, ChaCha20Poly1305)
+}
+CIPHER_NAMES = {cipher_id: name for name, (cipher_id, _) in CIPHERS.items()}
+DEFAULT_CIPHER = 'aes-gcm'
+
+# The KDF parameter is the iteration count for PBKDF2 and
+# log2 n << 16 | r << 8 | p for scrypt, see PasswordEncryption.scrypt_param
+KDFS = {
+    'pbkdf2-sha256': 1,
+    'scrypt': 2
+}
+KDF_NAMES = {kdf_id: name for name, kdf_id in KDFS.items()}
+DEFAULT_KDF = 'pbkdf2-sha256'
+
+
+class KeyCache:
+    """Process-wide LRU cache of derived keys, bounded by entry count and age
+    
+    Entries are keyed by an HMAC of the password under a per-process secret,
+    so the password itself is never stored. Keys are held in bytearrays and
+    zeroed when evicted, expired or cleared; expired entries are dropped on
+    every get, put and stats call.
+    """
+    
+    def __init__(self, max_entries: int = KEY_CACHE_ENTRIES, max_age: float = KEY_CACHE_MAX_AGE):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def key(self, password: str, salt: bytes, params: tuple) -> tuple:
+        """Cache key for a password, salt and KDF parameters"""
+        digest = hmac.new(self._secret, password.encode(), hashlib.sha256).digest()
+        return (digest, bytes(salt), params)
+    
+    def get(self, key):
+        """Return a copy of the cached derived key, or None"""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return bytes(entry[1])
+    
+    def put(self, key, derived: bytes):
+        """Store derived and evict the least recently used entries over the limit"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._expire()
+            if key in self._entries:
+                self._wipe(self._entries.pop(key)[1])
+            self._entries[key] = (time.monotonic(), bytearray(derived))
+            while len(self._entries) > self.max_entries:
+                self._wipe(self._entries.popitem(last=False)[1][1])
+                self.evictions += 1
+    
+    def clear(self):
+        """Wipe and drop every entry, counters are kept"""
+        with self._lock:
+            for _, derived in self._entries.values():
+                self._wipe(derived)
+            self._entries.clear()
+    
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and current size"""
+        with self._lock:
+            self._expire()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'max_age': self.max_age
+            }
+    
+    def _expire(self):
+        """Drop every entry older than max_age; caller holds the lock
+        
+        Lookups reorder entries by last use, not creation, so all of them
+        are checked; the cache is small enough for a full scan.
+        """
+        deadline = time.monotonic() - self.max_age
+        expired = [key for key, (created, _) in self._entries.items() if created < deadline]
+        for key in expired:
+            self._wipe(self._entries.pop(key)[1])
+            self.evictions += 1
+    
+    @staticmethod
+    def _wipe(derived: bytearray):
+        derived[:] = bytes(len(derived))
+
+
+key_cache = KeyCache()
 
 
 class PasswordEncryption:
@@ -12,36 +176,425 @@ class PasswordEncryption:
     
     @staticmethod
     def derive_key(password: str, salt: bytes = None) -> tuple:
-        if salt is None:
-            salt = os.urandom(16)
+        """Derive the Fernet key for password, served from key_cache when possible"""
+        fresh = salt is None
+        if fresh:
+            salt = os.urandom(SALT_SIZE)
+        raw = PasswordEncryption._derive(password, salt, 'pbkdf2-sha256', PBKDF2_ITERATIONS,
+                                         cache=not fresh)
+        return base64.urlsafe_b64encode(raw), salt
+    
+    @staticmethod
+    def _derive(password: str, salt: bytes, kdf: str, param: int, cache: bool = True) -> bytes:
+        """Raw 32-byte key from password, served from key_cache when possible
+        
+        Pass cache=False for a salt generated just now: nothing will look
+        that key up again, so caching it would only keep it in memory.
+        """
+        if not cache:
+            return PasswordEncryption._kdf(salt, kdf, param).derive(password.encode())
         
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return key, salt
+        cache_key = key_cache.key(password, salt, (kdf, param))
+        key = key_cache.get(cache_key)
+        if key is None:
+            key = PasswordEncryption._kdf(salt, kdf, param).derive(password.encode())
+            key_cache.put(cache_key, key)
+        return key
     
     @staticmethod
-    def encrypt_message(message: str, password: str) -> str:
-        key, salt = PasswordEncryption.derive_key(password)
-        fernet = Fernet(key)
-        encrypted = fernet.encrypt(message.encode())
-        return base64.b64encode(salt + encrypted).decode()
+    def _kdf(salt: bytes, kdf: str, param: int):
+        """KDF instance for a validated KDF name and parameter"""
+        if kdf == 'pbkdf2-sha256':
+            if not PBKDF2_ITERATION_RANGE[0] <= param <= PBKDF2_ITERATION_RANGE[1]:
+                raise ValueError(f"PBKDF2 iterations out of range: {param}")
+            return PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=salt,
+                iterations=param,
+            )
+        if kdf == 'scrypt':
+            log2_n, r, p = PasswordEncryption.scrypt_fields(param)
+            if not (SCRYPT_LOG2_N_RANGE[0] <= log2_n <= SCRYPT_LOG2_N_RANGE[1]
+                    and SCRYPT_R_RANGE[0] <= r <= SCRYPT_R_RANGE[1]
+                    and SCRYPT_P_RANGE[0] <= p <= SCRYPT_P_RANGE[1]
+                    and 128 * r << log2_n <= SCRYPT_MAX_MEMORY):
+                raise ValueError(f"scrypt parameters out of range: n=2^{log2_n}, r={r}, p={p}")
+            return Scrypt(salt=salt, length=32, n=1 << log2_n, r=r, p=p)
+        raise ValueError(f"Unknown KDF: {kdf}")
     
     @staticmethod
-    def decrypt_message(encrypted_message: str, password: str) -> str:
+    def scrypt_param(log2_n: int, r: int = 8, p: int = 1) -> int:
+        """Pack scrypt cost parameters into the envelope's KDF parameter"""
+        if not all(0 < value < 256 for value in (log2_n, r, p)):
+            raise ValueError("scrypt parameters must be 1-255")
+        return log2_n << 16 | r << 8 | p
+    
+    @staticmethod
+    def scrypt_fields(param: int) -> tuple:
+        """Unpack a scrypt KDF parameter into (log2 n, r, p)"""
+        return param >> 16 & 0xFF, param >> 8 & 0xFF, param & 0xFF
+    
+    @staticmethod
+    def kdf_param(kdf: str = DEFAULT_KDF, param: int = None) -> int:
+        """Return param, or the default parameter for kdf when it is None"""
+        if kdf not in KDFS:
+            raise ValueError(f"Unknown KDF: {kdf}")
+        if param is not None:
+            return param
+        if kdf == 'scrypt':
+            return PasswordEncryption.scrypt_param(*SCRYPT_PARAMS)
+        return PBKDF2_ITERATIONS
+    
+    @staticmethod
+    def calibrate(target_ms: float = 100, kdf: str = DEFAULT_KDF) -> int:
+        """Benchmark this machine and return the KDF parameter closest to target_ms
+        
+        PBKDF2 scales its iteration count from a short probe. scrypt keeps
+        r=8, doubles n until a derivation reaches the target or the memory
+        limit, then raises p if n alone falls short. Takes a few times
+        target_ms; pass the result as kdf_param.
+        """
+        if kdf not in KDFS:
+            raise ValueError(f"Unknown KDF: {kdf}")
+        if target_ms <= 0:
+            raise ValueError("target_ms must be positive")
+        target = target_ms / 1000
+        
+        def timed(param):
+            start = time.perf_counter()
+            PasswordEncryption._kdf(os.urandom(SALT_SIZE), kdf, param).derive(b"calibration")
+            return time.perf_counter() - start
+        
+        if kdf == 'pbkdf2-sha256':
+            iterations = PBKDF2_ITERATION_RANGE[0]
+            elapsed = timed(iterations)
+            while elapsed < CALIBRATION_PROBE_SECONDS and iterations < PBKDF2_ITERATION_RANGE[1]:
+                iterations = min(iterations * 4, PBKDF2_ITERATION_RANGE[1])
+                elapsed = timed(iterations)
+            iterations = round(iterations * target / elapsed, -3)
+            return int(min(max(iterations, PBKDF2_ITERATION_RANGE[0]), PBKDF2_ITERATION_RANGE[1]))
+        
+        r = SCRYPT_PARAMS[1]
+        log2_n = SCRYPT_LOG2_N_RANGE[0]
+        elapsed = timed(PasswordEncryption.scrypt_param(log2_n, r))
+        while elapsed < target and log2_n < SCRYPT_LOG2_N_RANGE[1] \
+                and 128 * r << (log2_n + 1) <= SCRYPT_MAX_MEMORY:
+            previous = elapsed
+            log2_n += 1
+            elapsed = timed(PasswordEncryption.scrypt_param(log2_n, r))
+            # Step back when the previous n was nearer the target, on a log scale
+            if elapsed >= target and target / previous < elapsed / target:
+                return PasswordEncryption.scrypt_param(log2_n - 1, r)
+        p = min(max(round(target / elapsed), SCRYPT_P_RANGE[0]), SCRYPT_P_RANGE[1])
+        return PasswordEncryption.scrypt_param(log2_n, r, p)
+    
+    @staticmethod
+    def session(password: str, salt: bytes = None, cipher: str = DEFAULT_CIPHER,
+                kdf: str = DEFAULT_KDF, kdf_param: int = None) -> 'KeySession':
+        """Derive one key for a batch of messages, see KeySession"""
+        return KeySession(password, salt, cipher, kdf, kdf_param)
+    
+    @staticmethod
+    def clear_key_cache():
+        """Wipe every cached derived key"""
+        key_cache.clear()
+    
+    @staticmethod
+    def encrypt_message(message, password: str, cipher: str = DEFAULT_CIPHER,
+                        kdf: str = DEFAULT_KDF, kdf_param: int = None) -> bytes:
+        """Encrypt a str or bytes into a binary envelope, ready to embed as is
+        
+        kdf_param defaults per KDF; see calibrate for picking one by latency.
+        The KDF and its parameter are stored in the envelope.
+        """
+        kdf_param = PasswordEncryption.kdf_param(kdf, kdf_param)
+        salt = os.urandom(SALT_SIZE)
+        key = PasswordEncryption._derive(password, salt, kdf, kdf_param, cache=False)
+        return PasswordEncryption._seal(key, salt, message, cipher, kdf, kdf_param)
+    
+    @staticmethod
+    def decrypt_message(encrypted_message, password: str) -> str:
+        return PasswordEncryption.decrypt_bytes(encrypted_message, password).decode()
+    
+    @staticmethod
+    def decrypt_bytes(encrypted_message, password: str) -> bytes:
+        """Decrypt a binary envelope or a legacy base64 Fernet message to raw bytes"""
         try:
-            data = base64.b64decode(encrypted_message.encode())
-            salt = data[:16]
-            encrypted = data[16:]
+            if isinstance(encrypted_message, str):
+                encrypted_message = encrypted_message.encode()
+            data = bytes(encrypted_message)
+            if data[:1] == bytes([STREAM_VERSION]):
+                return b"".join(StreamEncryption.decrypt([data], password))
+            if data[:1] == bytes([MULTI_VERSION]):
+                return PasswordEncryption._decrypt_multi(data, password, RECIPIENT_WORKERS)
+            if data[:1] != bytes([ENVELOPE_VERSION]):
+                return PasswordEncryption._decrypt_legacy(data, password)
             
-            key, _ = PasswordEncryption.derive_key(password, salt)
-            fernet = Fernet(key)
-            decrypted = fernet.decrypt(encrypted)
+            envelope = PasswordEncryption._parse(data)
+            key = PasswordEncryption._derive(password, envelope['salt'], envelope['kdf'],
+                                             envelope['param'])
+            return PasswordEncryption._unseal(key, envelope)
+        except Exception:
+            raise ValueError("Incorrect password or corrupted data")
+    
+    @staticmethod
+    def encrypt_for_recipients(message, passwords, cipher: str = DEFAULT_CIPHER,
+                               kdf: str = DEFAULT_KDF, kdf_param: int = None,
+                               workers: int = RECIPIENT_WORKERS) -> bytes:
+        """Encrypt once under a random content key wrapped for each password
+        
+        Any one of passwords opens the envelope through decrypt_bytes. The
+        per-password key derivations run in a thread pool.
+        """
+        if cipher not in CIPHERS:
+            raise ValueError(f"Unknown cipher: {cipher}")
+        if not 0 < len(passwords) <= MAX_RECIPIENTS:
+            raise ValueError(f"Need 1-{MAX_RECIPIENTS} passwords")
+        if isinstance(message, str):
+            message = message.encode()
+        
+        cipher_id, aead = CIPHERS[cipher]
+        kdf_param = PasswordEncryption.kdf_param(kdf, kdf_param)
+        header = _MULTI_HEADER.pack(MULTI_VERSION, cipher_id, len(passwords))
+        content_key = os.urandom(CONTENT_KEY_SIZE)
+        
+        def wrap(password):
+            salt = os.urandom(SALT_SIZE)
+            kek = PasswordEncryption._derive(password, salt, kdf, kdf_param, cache=False)
+            prefix = _SLOT.pack(KDFS[kdf], kdf_param) + salt
+            nonce = os.urandom(NONCE_SIZE)
+            return prefix + nonce + aead(kek).encrypt(nonce, content_key, header + prefix)
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            slots = b"".join(pool.map(wrap, passwords))
+        
+        prefix = header + slots
+        nonce = os.urandom(NONCE_SIZE)
+        return prefix + nonce + aead(content_key).encrypt(nonce, bytes(message), prefix)
+    
+    @staticmethod
+    def _decrypt_multi(data: bytes, password: str, workers: int) -> bytes:
+        """Try password on every slot in parallel and open the content with the first match"""
+        version, cipher_id, count = _MULTI_HEADER.unpack(data[:_MULTI_HEADER.size])
+        content_start = _MULTI_HEADER.size + count * SLOT_SIZE
+        if cipher_id not in CIPHER_NAMES or count == 0 or \
+                len(data) < content_start + NONCE_SIZE + TAG_SIZE:
+            raise ValueError("Unsupported envelope")
+        aead = CIPHERS[CIPHER_NAMES[cipher_id]][1]
+        header = data[:_MULTI_HEADER.size]
+        
+        def unwrap(index):
+            slot = data[_MULTI_HEADER.size + index * SLOT_SIZE:][:SLOT_SIZE]
+            kdf_id, param = _SLOT.unpack(slot[:_SLOT.size])
+            prefix_end = _SLOT.size + SALT_SIZE
+            salt, kdf = slot[_SLOT.size:prefix_end], KDF_NAMES[kdf_id]
             
-            return decrypted.decode()
+            # Only the slot that authenticates is cached, so slots meant for
+            # other passwords cannot push live keys out of key_cache
+            cache_key = key_cache.key(password, salt, (kdf, param))
+            kek = key_cache.get(cache_key)
+            cached = kek is not None
+            if not cached:
+                kek = PasswordEncryption._derive(password, salt, kdf, param, cache=False)
+            nonce = slot[prefix_end:prefix_end + NONCE_SIZE]
+            content_key = aead(kek).decrypt(nonce, slot[prefix_end + NONCE_SIZE:],
+                                            header + slot[:prefix_end])
+            if not cached:
+                key_cache.put(cache_key, kek)
+            return content_key
+        
+        pool = ThreadPoolExecutor(max_workers=min(workers, count))
+        try:
+            content_key = None
+            for future in as_completed([pool.submit(unwrap, i) for i in range(count)]):
+                if future.exception() is None:
+                    content_key = future.result()
+                    break
+        finally:
+            # Slots still queued are not worth deriving once one has matched
+            pool.shutdown(wait=True, cancel_futures=True)
+        if content_key is None:
+            raise ValueError("No recipient slot matches the password")
+        
+        nonce = data[content_start:content_start + NONCE_SIZE]
+        return aead(content_key).decrypt(nonce, data[content_start + NONCE_SIZE:], data[:content_start])
+    
+    @staticmethod
+    def _seal(key: bytes, salt: bytes, message, cipher: str, kdf: str, param: int) -> bytes:
+        """Build an envelope around message encrypted with key"""
+        if cipher not in CIPHERS:
+            raise ValueError(f"Unknown cipher: {cipher}")
+        if isinstance(message, str):
+            message = message.encode()
+        
+        cipher_id, aead = CIPHERS[cipher]
+        prefix = _ENVELOPE.pack(ENVELOPE_VERSION, cipher_id, KDFS[kdf], param) + salt
+        nonce = os.urandom(NONCE_SIZE)
+        return prefix + nonce + aead(key).encrypt(nonce, bytes(message), prefix)
+    
+    @staticmethod
+    def _parse(data: bytes) -> dict:
+        """Split an envelope into its fields"""
+        if len(data) < ENVELOPE_OVERHEAD:
+            raise ValueError("Envelope is truncated")
+        version, cipher_id, kdf_id, param = _ENVELOPE.unpack(data[:_ENVELOPE.size])
+        if version != ENVELOPE_VERSION or cipher_id not in CIPHER_NAMES or kdf_id not in KDF_NAMES:
+            raise ValueError("Unsupported envelope")
+        
+        salt_end = _ENVELOPE.size + SALT_SIZE
+        return {
+            'cipher': CIPHER_NAMES[cipher_id],
+            'kdf': KDF_NAMES[kdf_id],
+            'param': param,
+            'salt': data[_ENVELOPE.size:salt_end],
+            'nonce': data[salt_end:salt_end + NONCE_SIZE],
+            'ciphertext': data[salt_end + NONCE_SIZE:],
+            'aad': data[:salt_end]
+        }
+    
+    @staticmethod
+    def _unseal(key: bytes, envelope: dict) -> bytes:
+        """Authenticate and decrypt a parsed envelope"""
+        aead = CIPHERS[envelope['cipher']][1]
+        return aead(key).decrypt(envelope['nonce'], envelope['ciphertext'], envelope['aad'])
+    
+    @staticmethod
+    def _decrypt_legacy(data: bytes, password: str) -> bytes:
+        """Decrypt the original base64(salt + Fernet token) format"""
+        data = base64.b64decode(data)
+        key, _ = PasswordEncryption.derive_key(password, data[:SALT_SIZE])
+        return Fernet(key).decrypt(data[SALT_SIZE:])
+
+
+class KeySession:
+    """Encrypt many messages under one password with a single key derivation
+    
+    All messages share the session salt; the output is the regular
+    envelope, so PasswordEncryption.decrypt_bytes reads it too.
+    """
+    
+    def __init__(self, password: str, salt: bytes = None, cipher: str = DEFAULT_CIPHER,
+                 kdf: str = DEFAULT_KDF, kdf_param: int = None):
+        self.salt = os.urandom(SALT_SIZE) if salt is None else salt
+        self.cipher = cipher
+        self.kdf = kdf
+        self.kdf_param = PasswordEncryption.kdf_param(kdf, kdf_param)
+        self._key = PasswordEncryption._derive(password, self.salt, kdf, self.kdf_param)
+    
+    def encrypt_message(self, message) -> bytes:
+        """Encrypt a str or bytes with the session key"""
+        return PasswordEncryption._seal(self._key, self.salt, message, self.cipher,
+                                        self.kdf, self.kdf_param)
+    
+    def decrypt_bytes(self, encrypted_message) -> bytes:
+        """Decrypt an envelope sealed under this session's salt and KDF parameters"""
+        try:
+            envelope = PasswordEncryption._parse(bytes(encrypted_message))
+            if (envelope['salt'], envelope['kdf'], envelope['param']) != \
+                    (self.salt, self.kdf, self.kdf_param):
+                raise ValueError("Message was encrypted under a different key")
+            return PasswordEncryption._unseal(self._key, envelope)
+        except Exception:
+            raise ValueError("Incorrect password or corrupted data")
+
+
+class StreamEncryption:
+    """Chunked AEAD for payloads too large to hold in memory
+    
+    encrypt and decrypt are generators over iterables of byte chunks of any
+    size, so they chain with file readers, PayloadStream and the carriers'
+    stream_payload without materialising the whole payload.
+    """
+    
+    @staticmethod
+    def encrypted_size(size: int, chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+        """Length of the stream encrypt produces for size plaintext bytes"""
+        return STREAM_HEADER_SIZE + size + TAG_SIZE * max(1, -(-size // chunk_size))
+    
+    @staticmethod
+    def payload_stream(chunks, size: int, password: str, chunk_size: int = STREAM_CHUNK_SIZE,
+                       cipher: str = DEFAULT_CIPHER, kdf: str = DEFAULT_KDF,
+                       kdf_param: int = None) -> PayloadStream:
+        """Encrypt size bytes of chunks into a PayloadStream for the carriers"""
+        return PayloadStream(StreamEncryption.encrypt(chunks, password, chunk_size, cipher,
+                                                      kdf, kdf_param),
+                             StreamEncryption.encrypted_size(size, chunk_size))
+    
+    @staticmethod
+    def encrypt(chunks, password: str, chunk_size: int = STREAM_CHUNK_SIZE,
+                cipher: str = DEFAULT_CIPHER, kdf: str = DEFAULT_KDF, kdf_param: int = None):
+        """Yield the stream header, then one sealed block per chunk_size plaintext bytes"""
+        if cipher not in CIPHERS:
+            raise ValueError(f"Unknown cipher: {cipher}")
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be 1-{STREAM_MAX_CHUNK_SIZE}")
+        
+        cipher_id, aead = CIPHERS[cipher]
+        kdf_param = PasswordEncryption.kdf_param(kdf, kdf_param)
+        salt = os.urandom(SALT_SIZE)
+        key = PasswordEncryption._derive(password, salt, kdf, kdf_param, cache=False)
+        header = _STREAM_HEADER.pack(STREAM_VERSION, cipher_id, KDFS[kdf],
+                                     kdf_param, chunk_size) + salt + \
+            os.urandom(STREAM_NONCE_PREFIX_SIZE)
+        yield header
+        
+        sealer = aead(key)
+        prefix = header[-STREAM_NONCE_PREFIX_SIZE:]
+        for index, (block, last) in enumerate(StreamEncryption._blocks(chunks, chunk_size)):
+            yield sealer.encrypt(prefix + _STREAM_NONCE_SUFFIX.pack(index, last), block, header)
+    
+    @staticmethod
+    def decrypt(chunks, password: str):
+        """Yield plaintext chunks, authenticating each block before it is released"""
+        pieces = iter(chunks)
+        head = b""
+        while len(head) < STREAM_HEADER_SIZE:
+            piece = next(pieces, None)
+            if piece is None:
+                raise ValueError("Stream is truncated")
+            head += bytes(piece)
+        header, rest = head[:STREAM_HEADER_SIZE], head[STREAM_HEADER_SIZE:]
+        
+        # Nothing is authenticated yet, so refuse chunk sizes that would
+        # make _blocks buffer more than STREAM_MAX_CHUNK_SIZE first
+        version, cipher_id, kdf_id, param, chunk_size = _STREAM_HEADER.unpack(
+            header[:_STREAM_HEADER.size])
+        if version != STREAM_VERSION or cipher_id not in CIPHER_NAMES or \
+                kdf_id not in KDF_NAMES or not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise ValueError("Unsupported stream")
+        
+        try:
+            salt = header[_STREAM_HEADER.size:_STREAM_HEADER.size + SALT_SIZE]
+            key = PasswordEncryption._derive(password, salt, KDF_NAMES[kdf_id], param)
         except Exception:
             raise ValueError("Incorrect password or corrupted data")
+        
+        opener = CIPHERS[CIPHER_NAMES[cipher_id]][1](key)
+        prefix = header[-STREAM_NONCE_PREFIX_SIZE:]
+        blocks = StreamEncryption._blocks(chain([rest], pieces), chunk_size + TAG_SIZE)
+        for index, (block, last) in enumerate(blocks):
+            try:
+                yield opener.decrypt(prefix + _STREAM_NONCE_SUFFIX.pack(index, last), block, header)
+            except Exception:
+                raise ValueError("Incorrect password or corrupted data")
+    
+    @staticmethod
+    def _blocks(pieces, size: int):
+        """Regroup pieces into (block, is_last) pairs of size bytes; the last may be short or empty"""
+        buffer = bytearray()
+        pending = None
+        for piece in pieces:
+            buffer += piece
+            start = 0
+            while len(buffer) - start > size:
+                if pending is not None:
+                    yield pending, False
+                pending = bytes(buffer[start:start + size])
+                start += size
+            del buffer[:start]
+        if buffer:
+            if pending is not None:
+                yield pending, False
+            pending = bytes(buffer)
+        yield (b"" if pending is None else pending), True
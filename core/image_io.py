@@ -0,0 +1,195 @@
+"""Image I/O helpers shared by the core modules"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+EXIF_ORIENTATION = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)  # rotated by 90 or 270 degrees
+
+# Lossless output backends. PNG takes a zlib level (0-9); the others have
+# fixed parameters: WebP quality above 100 selects lossless, TIFF
+# compression 5 is LZW.
+OUTPUT_FORMATS = {
+    'png': {'ext': '.png', 'level_flag': cv2.IMWRITE_PNG_COMPRESSION, 'default_level': 1},
+    'webp': {'ext': '.webp', 'params': [cv2.IMWRITE_WEBP_QUALITY, 101]},
+    'tiff': {'ext': '.tiff', 'params': [cv2.IMWRITE_TIFF_COMPRESSION, 5]},
+    'bmp': {'ext': '.bmp', 'params': []}
+}
+OUTPUT_EXTENSIONS = {'.png': 'png', '.webp': 'webp', '.tif': 'tiff', '.tiff': 'tiff', '.bmp': 'bmp'}
+
+# (format, level) picked by each policy, see benchmarks/bench_output.py
+OUTPUT_POLICIES = {
+    'fastest': ('bmp', None),
+    'smallest': ('webp', None)
+}
+
+
+class ImageCache:
+    """Process-wide LRU cache of decoded images with a byte budget
+    
+    Entries are keyed by (path, mtime, size, read flags), so a rewritten
+    file is never served stale. Cached arrays are read-only; copy before
+    modifying.
+    """
+    
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def key(image_path: str, flags: int) -> tuple:
+        """Cache key for a file as it is on disk right now"""
+        stat = os.stat(image_path)
+        return (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, flags)
+    
+    def get(self, key):
+        """Return the cached array for key, or None"""
+        with self._lock:
+            img = self._entries.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return img
+    
+    def put(self, key, img: np.ndarray):
+        """Store img and evict least recently used entries over the budget"""
+        if img.nbytes > self.max_bytes:
+            return
+        img.flags.writeable = False
+        
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key).nbytes
+            self._entries[key] = img
+            self._bytes += img.nbytes
+            
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry, counters are kept"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and current memory use"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+image_cache = ImageCache()
+
+
+class ImageIO:
+    """Load images from paths, ndarrays or encoded bytes"""
+    
+    @staticmethod
+    def read(image_path: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+        """Decode an image file through the shared cache, the result is read-only"""
+        try:
+            key = ImageCache.key(image_path, flags)
+        except OSError:
+            raise ValueError("Could not read image")
+        
+        img = image_cache.get(key)
+        if img is None:
+            img = cv2.imread(image_path, flags)
+            if img is None:
+                raise ValueError("Could not read image")
+            image_cache.put(key, img)
+        return img
+    
+    @staticmethod
+    def probe_size(image_path: str) -> tuple:
+        """Read (width, height) from the file header without decoding pixels
+        
+        Sizes follow EXIF orientation, as cv2.imread applies it on decode.
+        """
+        try:
+            with Image.open(image_path) as img:
+                width, height = img.size
+                if img.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+                    return height, width
+                return width, height
+        except (OSError, ValueError):
+            raise ValueError("Could not read image")
+    
+    @staticmethod
+    def load(image, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+        """Accept an ndarray as is, or decode encoded image bytes"""
+        if isinstance(image, np.ndarray):
+            return image
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            img = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), flags)
+            if img is None:
+                raise ValueError("Could not decode image bytes")
+            return img
+        raise TypeError("Image must be an ndarray or encoded image bytes")
+    
+    @staticmethod
+    def output_params(fmt: str, level: int = None) -> tuple:
+        """Resolve an output format into (extension, cv2 write params)"""
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {fmt}")
+        spec = OUTPUT_FORMATS[fmt]
+        
+        if 'level_flag' in spec:
+            level = spec['default_level'] if level is None else level
+            return spec['ext'], [spec['level_flag'], level]
+        return spec['ext'], list(spec['params'])
+    
+    @staticmethod
+    def write(output_path: str, img: np.ndarray, fmt: str = None, level: int = None,
+              policy: str = None) -> str:
+        """Write img losslessly and return the path actually written
+        
+        The format comes from policy, then fmt, then the path extension
+        (PNG if unknown). The extension is rewritten to match the format.
+        """
+        if policy is not None:
+            if policy not in OUTPUT_POLICIES:
+                raise ValueError(f"Unknown output policy: {policy}")
+            fmt, level = OUTPUT_POLICIES[policy]
+        
+        root, path_ext = os.path.splitext(output_path)
+        if fmt is None:
+            fmt = OUTPUT_EXTENSIONS.get(path_ext.lower(), 'png')
+        
+        ext, params = ImageIO.output_params(fmt, level)
+        if OUTPUT_EXTENSIONS.get(path_ext.lower()) != fmt:
+            output_path = root + ext
+        
+        if not cv2.imwrite(output_path, img, params):
+            raise ValueError(f"Could not write image to {output_path}")
+        return output_path
+    
+    @staticmethod
+    def encode(img: np.ndarray, ext: str = '.png', params=None) -> bytes:
+        """Encode an image into bytes of the given format"""
+        ok, buffer = cv2.imencode(ext, img, params or [])
+        if not ok:
+            raise ValueError(f"Could not encode image as {ext}")
+        return buffer.tobytes()
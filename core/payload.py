@@ -0,0 +1,165 @@
+"""Payload header - versioned, length-prefixed container for embedded data"""
+
+import struct
+
+import numpy as np
+
+MAGIC = b"\x89STG"
+FORMAT_VERSION = 1
+
+METHOD_IDS = {
+    'LSB': 1,
+    'LSB_MATCH': 2,
+    'PVD': 3,
+    'MATRIX': 4
+}
+METHOD_NAMES = {method_id: name for name, method_id in METHOD_IDS.items()}
+
+# Codec the payload was compressed with before encryption, see core/compression.py
+COMPRESSION_IDS = {
+    'none': 0,
+    'zlib': 1,
+    'lzma': 2,
+    'bz2': 3
+}
+COMPRESSION_NAMES = {codec_id: name for name, codec_id in COMPRESSION_IDS.items()}
+
+# Header flags
+FLAG_BINARY = 0x80  # payload is raw bytes rather than UTF-8 text
+FLAG_SCATTERED = 0x40  # payload positions follow a keyed permutation
+FLAG_SHARDED = 0x20  # payload is one shard of a larger one, see ShardHeader
+FLAG_COMPRESSION_MASK = 0x18  # compression codec id
+COMPRESSION_SHIFT = 3
+FLAG_PARAM_MASK = 0x07  # method parameter minus one: LSB bits per channel, MATRIX p
+
+# magic, format version, method id, flags, payload length (big-endian)
+_HEADER = struct.Struct(">4sBBBI")
+HEADER_SIZE = _HEADER.size
+HEADER_BITS = HEADER_SIZE * 8
+
+# payload id, sequence number, total shard count, shard flags (big-endian)
+_SHARD_HEADER = struct.Struct(">8sHHB")
+SHARD_HEADER_SIZE = _SHARD_HEADER.size
+MAX_SHARDS = 0xFFFF
+SHARD_TEXT = 0x01  # reassembled payload is UTF-8 text
+
+
+class PayloadHeader:
+    """Header written into the first pixels ahead of every payload"""
+    
+    @staticmethod
+    def pack(method: str, length: int, flags: int = 0, param: int = 1,
+             compression: str = 'none') -> bytes:
+        """Build header bytes for a payload of `length` bytes
+        
+        param is the method parameter (1-8), stored in the low flag bits;
+        compression names the codec applied to the payload.
+        """
+        if method not in METHOD_IDS:
+            raise ValueError(f"Unknown method: {method}")
+        if not 1 <= param <= FLAG_PARAM_MASK + 1:
+            raise ValueError(f"Method parameter out of range: {param}")
+        if compression not in COMPRESSION_IDS:
+            raise ValueError(f"Unknown compression codec: {compression}")
+        flags &= ~(FLAG_PARAM_MASK | FLAG_COMPRESSION_MASK)
+        flags |= (param - 1) | (COMPRESSION_IDS[compression] << COMPRESSION_SHIFT)
+        return _HEADER.pack(MAGIC, FORMAT_VERSION, METHOD_IDS[method], flags, length)
+    
+    @staticmethod
+    def unpack(data: bytes) -> dict:
+        """Parse header bytes, returns None if the magic does not match"""
+        if len(data) < HEADER_SIZE:
+            return None
+        
+        magic, version, method_id, flags, length = _HEADER.unpack(data[:HEADER_SIZE])
+        if magic != MAGIC:
+            return None
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported payload format version {version}")
+        if method_id not in METHOD_NAMES:
+            raise ValueError(f"Unknown method id {method_id}")
+        
+        return {
+            'version': version,
+            'method': METHOD_NAMES[method_id],
+            'flags': flags,
+            'param': (flags & FLAG_PARAM_MASK) + 1,
+            'compression': COMPRESSION_NAMES[(flags & FLAG_COMPRESSION_MASK) >> COMPRESSION_SHIFT],
+            'length': length
+        }
+
+
+class ShardHeader:
+    """Prefix of every shard payload, ties the shards of one payload together"""
+    
+    @staticmethod
+    def pack(payload_id: bytes, seq: int, total: int, text: bool = False) -> bytes:
+        """Build the prefix for shard seq (0-based) of total"""
+        if not 0 <= seq < total <= MAX_SHARDS:
+            raise ValueError(f"Invalid shard {seq} of {total}")
+        return _SHARD_HEADER.pack(payload_id, seq, total, SHARD_TEXT if text else 0)
+    
+    @staticmethod
+    def unpack(data: bytes) -> dict:
+        """Parse a shard prefix"""
+        if len(data) < SHARD_HEADER_SIZE:
+            raise ValueError("Shard payload is truncated")
+        
+        payload_id, seq, total, flags = _SHARD_HEADER.unpack(data[:SHARD_HEADER_SIZE])
+        if seq >= total:
+            raise ValueError(f"Invalid shard {seq} of {total}")
+        
+        return {
+            'payload_id': payload_id,
+            'seq': seq,
+            'total': total,
+            'text': bool(flags & SHARD_TEXT)
+        }
+
+
+class PayloadStream:
+    """Payload of known length delivered as an iterable of byte chunks
+    
+    Carriers that embed sequentially (video, audio) pull the chunks as they
+    go, so output such as StreamEncryption.encrypt is never held whole.
+    """
+    
+    def __init__(self, chunks, length: int):
+        self.chunks = iter(chunks)
+        self.length = length
+    
+    def __len__(self):
+        return self.length
+
+
+class BitReader:
+    """Sequential reader of payload bits, MSB first, over bytes or a PayloadStream"""
+    
+    def __init__(self, payload):
+        if isinstance(payload, PayloadStream):
+            self._chunks = payload.chunks
+            self._buffer = memoryview(b"")
+        else:
+            self._chunks = iter(())
+            self._buffer = memoryview(payload).cast('B')
+        self._bit = 0
+    
+    def read(self, count: int) -> np.ndarray:
+        """Return the next count bits as a uint8 array"""
+        end = self._bit + count
+        needed = -(-end // 8)
+        if len(self._buffer) < needed:
+            parts = [self._buffer]
+            available = len(self._buffer)
+            while available < needed:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    raise ValueError("Payload stream ended before its declared length")
+                parts.append(chunk)
+                available += len(chunk)
+            self._buffer = memoryview(b"".join(parts))
+        
+        bits = np.unpackbits(np.frombuffer(self._buffer[:needed], dtype=np.uint8))[self._bit:end]
+        self._buffer = self._buffer[end // 8:]
+        self._bit = end % 8
+        return bits
@@ -0,0 +1,149 @@
+"""Payload sharding - spread one payload over several cover images"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from core.image_io import ImageIO
+from core.payload import ShardHeader, SHARD_HEADER_SIZE, MAX_SHARDS
+from core.steganography import Steganography
+
+SHARD_WORKERS = 8
+
+
+class PayloadSharding:
+    """Split a payload into indexed shards, one per cover, and join them back"""
+    
+    @staticmethod
+    def encode_message(image_paths, message, output_paths, method='LSB',
+                       workers: int = SHARD_WORKERS, **options) -> dict:
+        """Encode message across image_paths, filling covers in order
+        
+        Each cover gets a shard tagged with a random payload id, its sequence
+        number and the shard count; covers left over once the payload is
+        placed are not written. output_paths pairs with image_paths. Other
+        options go to Steganography.encode_message, which runs once per
+        shard in a thread pool.
+        """
+        try:
+            if len(image_paths) != len(output_paths):
+                raise ValueError("Need one output path per cover image")
+            
+            text = isinstance(message, str)
+            payload = memoryview(message.encode('utf-8') if text else message).cast('B')
+            capacities = PayloadSharding._shard_capacities(image_paths, method, workers, options)
+            
+            chunks = []
+            offset = 0
+            for image_path, output_path, capacity in zip(image_paths, output_paths, capacities):
+                if offset >= len(payload) and chunks:
+                    break
+                if capacity > 0:
+                    chunks.append((image_path, output_path, payload[offset:offset + capacity]))
+                    offset += capacity
+            
+            if offset < len(payload):
+                raise ValueError(f"Message too large. Max {sum(max(c, 0) for c in capacities)} "
+                                 f"bytes across {len(image_paths)} covers")
+            if len(chunks) > MAX_SHARDS:
+                raise ValueError(f"Message needs more than {MAX_SHARDS} shards")
+            
+            payload_id = os.urandom(8)
+            total = len(chunks)
+            
+            def encode_shard(seq):
+                image_path, output_path, chunk = chunks[seq]
+                shard = ShardHeader.pack(payload_id, seq, total, text) + chunk
+                return Steganography.encode_message(image_path, shard, output_path, method,
+                                                    sharded=True, **options)
+            
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(encode_shard, range(total)))
+            
+            failed = [r['error'] for r in results if not r['success']]
+            if failed:
+                raise ValueError(f"Shard encoding failed: {failed[0]}")
+            
+            return {
+                'success': True,
+                'output_paths': [r['output_path'] for r in results],
+                'shards': total,
+                'payload_id': payload_id.hex(),
+                'message_length': len(message),
+                'method': method
+            }
+        
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def _shard_capacities(image_paths, method, workers, options) -> list:
+        """Payload bytes each cover can take after the shard prefix
+        
+        PVD capacity depends on pixel content, so those covers are decoded
+        and measured; other methods are sized from the image header.
+        """
+        if method == 'PVD':
+            def measure(image_path):
+                try:
+                    return Steganography._pvd_capacity(ImageIO.read(image_path))
+                except Exception as e:
+                    raise ValueError(f"{image_path}: {e}")
+            
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return [size - SHARD_HEADER_SIZE for size in pool.map(measure, image_paths)]
+        
+        params = {name: options[name] for name in ('bits_per_channel', 'matrix_p') if name in options}
+        capacities = Steganography.get_image_capacities(image_paths, workers, **params)
+        sizes = []
+        for image_path in image_paths:
+            result = capacities[image_path]
+            if not result['success']:
+                raise ValueError(f"{image_path}: {result['error']}")
+            sizes.append(result['capacity'][method] - SHARD_HEADER_SIZE)
+        return sizes
+    
+    @staticmethod
+    def decode_message(image_paths, key=None, workers: int = SHARD_WORKERS) -> dict:
+        """Extract shards from image_paths in parallel and reassemble them
+        
+        Images may come in any order; images without a shard are ignored
+        and duplicate shards are read once.
+        """
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda path: Steganography.decode_message(path, key),
+                                        image_paths))
+            
+            groups = {}
+            for result in results:
+                if result['success'] and 'shard' in result:
+                    shard = result['shard']
+                    groups.setdefault(shard['payload_id'], {})[shard['seq']] = result
+            if not groups:
+                raise ValueError("No shards found")
+            if len(groups) > 1:
+                raise ValueError(f"Images hold shards of {len(groups)} different payloads")
+            
+            payload_id, shards = groups.popitem()
+            first = next(iter(shards.values()))
+            total = first['shard']['total']
+            if len(shards) != total:
+                missing = sorted(set(range(total)) - set(shards))
+                raise ValueError(f"Missing {len(missing)} of {total} shards: {missing[:10]}")
+            
+            data = b"".join(shards[seq]['data'] for seq in range(total))
+            message = data.decode('utf-8') if first['shard']['text'] else None
+            
+            return {
+                'success': True,
+                'message': message,
+                'data': data,
+                'length': len(data) if message is None else len(message),
+                'method': first['method'],
+                'compression': first['compression'],
+                'shards': total,
+                'payload_id': payload_id.hex()
+            }
+        
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
@@ -4,6 +4,8 @@ import cv2
 import numpy as np
 from scipy import stats
 
+from core.image_io import ImageIO
+
 
 class Steganalysis:
     """Detect hidden messages in images"""
@@ -11,7 +13,11 @@ class Steganalysis:
     @staticmethod
     def chi_square_test(image_path: str) -> dict:
         """Chi-square attack detection"""
-        img = cv2.imread(image_path)
+        return Steganalysis._chi_square(ImageIO.read(image_path))
+    
+    @staticmethod
+    def _chi_square(img) -> dict:
+        """Chi-square attack detection on an in-memory image"""
         flat = img.flatten()
         
         # Count frequency of pixel values
@@ -31,7 +37,11 @@ class Steganalysis:
     @staticmethod
     def lsb_analysis(image_path: str) -> dict:
         """Analyze LSB bit patterns"""
-        img = cv2.imread(image_path)
+        return Steganalysis._lsb(ImageIO.read(image_path))
+    
+    @staticmethod
+    def _lsb(img) -> dict:
+        """LSB bit pattern analysis on an in-memory image"""
         lsb_layer = img & 1
         
         # Calculate randomness
@@ -48,7 +58,13 @@ class Steganalysis:
     @staticmethod
     def entropy_analysis(image_path: str) -> dict:
         """Calculate image entropy"""
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        return Steganalysis._entropy(ImageIO.read(image_path, cv2.IMREAD_GRAYSCALE))
+    
+    @staticmethod
+    def _entropy(img) -> dict:
+        """Entropy of an in-memory image, converted to grayscale if needed"""
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
         hist = cv2.calcHist([img], [0], None, [256], [0, 256])
         hist = hist.flatten() / hist.sum()
@@ -69,9 +85,15 @@ class Steganalysis:
     @staticmethod
     def full_analysis(image_path: str) -> dict:
         """Perform complete steganalysis"""
-        chi = Steganalysis.chi_square_test(image_path)
-        lsb = Steganalysis.lsb_analysis(image_path)
-        entropy = Steganalysis.entropy_analysis(image_path)
+        return Steganalysis.analyze_array(ImageIO.read(image_path))
+    
+    @staticmethod
+    def analyze_array(image) -> dict:
+        """Perform complete steganalysis on an ndarray or encoded image bytes"""
+        img = ImageIO.load(image)
+        chi = Steganalysis._chi_square(img)
+        lsb = Steganalysis._lsb(img)
+        entropy = Steganalysis._entropy(img)
         
         suspicious_count = sum([chi['suspicious'], lsb['suspicious'], entropy['suspicious']])
         
@@ -2,162 +2,748 @@
 
 import cv2
 import numpy as np
-import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core.image_io import ImageIO, ImageCache, image_cache
+from core.keyed_order import KeyedPermutation
+from core.payload import (PayloadHeader, ShardHeader, PayloadStream, BitReader, HEADER_BITS,
+                          SHARD_HEADER_SIZE, FLAG_BINARY, FLAG_SCATTERED, FLAG_SHARDED)
+
+END_MARKER = b"<<<END>>>"
+EXTRACT_CHUNK_BYTES = 4096
+MAX_BITS_PER_CHANNEL = 4
+DEFAULT_MATRIX_P = 3
+MAX_MATRIX_P = 8
+MIN_TILE_VALUES = 1 << 18  # smallest slice worth handing to a worker thread
+PVD_CHUNK_PAIRS = 1 << 20  # most pairs PVD holds in its work arrays at once
+AUDIO_EXTENSIONS = ('.wav', '.wave')  # carriers handled by core.audio
+AUDIO_OPTIONS = ('bits_per_channel', 'workers', 'compression')
+
+# Extractors for payloads with a header, keyed by the method id it records
+EXTRACTORS = {
+    'LSB': '_decode_lsb',
+    'LSB_MATCH': '_decode_lsb',
+    'PVD': '_decode_pvd',
+    'MATRIX': '_decode_matrix'
+}
+
+# Stream extractors probed for header-less <<<END>>> images. Legacy LSB
+# matching reads back through plain LSB; the legacy PVD encoder loses sync
+# whenever a pair's difference crosses 8, so its output is not reliably
+# recoverable and is not listed.
+LEGACY_EXTRACTORS = {
+    'LSB': '_stream_legacy_lsb'
+}
+
+# Wu-Tsai range table: lower/upper bound of each difference range and the
+# number of bits a pair in that range carries (log2 of the range width)
+PVD_LOWER = np.array([0, 8, 16, 32, 64, 128], dtype=np.int16)
+PVD_UPPER = np.array([7, 15, 31, 63, 127, 255], dtype=np.int16)
+PVD_BITS = np.array([3, 3, 4, 5, 6, 7], dtype=np.uint8)
+PVD_RANGE = np.searchsorted(PVD_UPPER, np.arange(256)).astype(np.uint8)
+PVD_MAX_BITS = int(PVD_BITS.max())
+# Per pair bit count n and bit j (MSB first): whether j is carried, the
+# shift that places it and its weight in the embedded value
+PVD_IN_PAIR = np.arange(PVD_MAX_BITS) < np.arange(PVD_MAX_BITS + 1)[:, None]
+PVD_SHIFTS = np.maximum(np.arange(PVD_MAX_BITS + 1)[:, None] - 1 - np.arange(PVD_MAX_BITS),
+                        0).astype(np.uint8)
+PVD_WEIGHTS = np.where(PVD_IN_PAIR, 1 << PVD_SHIFTS, 0).astype(np.uint8)
+
+
+def _pvd_adjust(p1, p2, d, new_d):
+    """Move a pair to difference new_d, splitting the change between both pixels"""
+    m = new_d - d
+    floor_half = m // 2
+    ceil_half = -(-m // 2)
+    odd = (d & 1).astype(bool)
+    return (np.where(odd, p1 - ceil_half, p1 - floor_half),
+            np.where(odd, p2 + floor_half, p2 + ceil_half))
+
+
+def _pvd_capacity_table():
+    """Bits carried by every (p1, p2) pair, 0 where the pair would fall off 0..255
+    
+    A pair is usable only if the largest difference of its range still fits;
+    embedding never changes the range, so the decoder reaches the same answer.
+    """
+    p1, p2 = np.meshgrid(np.arange(256, dtype=np.int16), np.arange(256, dtype=np.int16),
+                         indexing='ij')
+    d = p2 - p1
+    k = PVD_RANGE[np.abs(d)]
+    upper = np.where(d < 0, -PVD_UPPER[k], PVD_UPPER[k])
+    q1, q2 = _pvd_adjust(p1, p2, d, upper)
+    usable = (q1 >= 0) & (q1 <= 255) & (q2 >= 0) & (q2 <= 255)
+    return np.where(usable, PVD_BITS[k], 0).astype(np.uint8)
+
+
+PVD_CAPACITY = _pvd_capacity_table()
 
 
 class Steganography:
     """LSB Steganography with multiple algorithms"""
     
     @staticmethod
-    def encode_message(image_path: str, message: str, output_path: str, method='LSB') -> dict:
-        """Encode message into image"""
+    def encode_message(image_path: str, message, output_path: str, method='LSB',
+                       output_format=None, compression_level=None, policy=None,
+                       **options) -> dict:
+        """Encode a text message or binary payload into an image or WAV file
+        
+        output_format: 'png', 'webp', 'tiff' or 'bmp', default from output_path
+        compression_level: PNG zlib level
+        policy: 'fastest' or 'smallest', picks the format instead
+        options: passed to encode_array; WAV files take only bits_per_channel,
+            workers and compression
+        The path written, extension adjusted, is returned as 'output_path'.
+        """
+        try:
+            audio = Steganography._audio_carrier(image_path)
+            if audio is not None:
+                options = Steganography._audio_options(dict(
+                    options, output_format=output_format,
+                    compression_level=compression_level, policy=policy))
+                return audio.encode_message(image_path, message, output_path, method, **options)
+            
+            img = ImageIO.read(image_path)
+            result = Steganography.encode_array(img, message, method, **options)
+            if result['success']:
+                stego = result.pop('image')
+                output_path = ImageIO.write(output_path, stego, output_format,
+                                            compression_level, policy)
+                result['output_path'] = output_path
+                # Output is lossless, so the array is exactly what a re-read would decode
+                image_cache.put(ImageCache.key(output_path, cv2.IMREAD_COLOR), stego)
+            return result
+        
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def _audio_carrier(path: str):
+        """AudioCarrier if path names a WAV file, else None"""
+        if not path.lower().endswith(AUDIO_EXTENSIONS):
+            return None
+        from core.audio import AudioCarrier  # core.audio builds on this module
+        return AudioCarrier
+    
+    @staticmethod
+    def _audio_options(options: dict) -> dict:
+        """The options AudioCarrier takes, raising if any other is set to more than None/False"""
+        unsupported = sorted(name for name, value in options.items()
+                             if name not in AUDIO_OPTIONS and value is not None and value is not False)
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} not supported for audio carriers")
+        return {name: value for name, value in options.items() if name in AUDIO_OPTIONS}
+    
+    @staticmethod
+    def encode_array(image, message, method='LSB', rng=None, output_ext=None,
+                     metrics=False, bits_per_channel=1, key=None, workers=1,
+                     compression='none', sharded=False, matrix_p=DEFAULT_MATRIX_P) -> dict:
+        """Encode a message into a BGR ndarray or encoded image bytes
+        
+        output_ext: return the stego image encoded as this format, '.png' for bytes input
+        rng: numpy Generator for the LSB_MATCH steps
+        metrics: also report 'psnr', 'mse' and 'changed_pixels'
+        bits_per_channel: low bits carrying payload per value, 1-4, LSB only
+        key: scatter the payload over keyed positions, not for PVD
+        workers: thread-pool tiles, the output is the same for any count
+        compression: codec already applied to message, recorded in the header
+        sharded: message is a PayloadSharding shard
+        matrix_p: bits per Hamming block of 2^p - 1 values, 2-8, MATRIX only
+        """
         try:
-            img = cv2.imread(image_path)
-            if img is None:
-                raise ValueError("Could not read image")
+            img = ImageIO.load(image)
+            cover = image if img is image else img
+            img = img.copy() if img is image or metrics else img
+            if img.dtype != np.uint8 or img.ndim != 3 or img.shape[2] != 3:
+                raise ValueError("Image must be an 8-bit, 3-channel array")
+            if output_ext is None and not isinstance(image, np.ndarray):
+                output_ext = '.png'
+            
+            k = bits_per_channel
+            if k not in range(1, MAX_BITS_PER_CHANNEL + 1) or (k > 1 and method != 'LSB'):
+                raise ValueError(f"bits_per_channel must be 1-{MAX_BITS_PER_CHANNEL}, above 1 for LSB only")
+            if method == 'MATRIX' and matrix_p not in range(2, MAX_MATRIX_P + 1):
+                raise ValueError(f"matrix_p must be 2-{MAX_MATRIX_P}")
+            if key is not None and method == 'PVD':
+                raise ValueError("Keyed pixel ordering is not supported for PVD")
             
-            message = message + "<<<END>>>"
-            binary_message = ''.join(format(ord(char), '08b') for char in message)
-            message_length = len(binary_message)
+            payload, flags = Steganography._to_payload(message)
+            if key is not None:
+                flags |= FLAG_SCATTERED
+            if sharded:
+                flags |= FLAG_SHARDED
+            # param payload bits go into every group of touched values
+            param, group = (matrix_p, (1 << matrix_p) - 1) if method == 'MATRIX' else (k, 1)
+            header = PayloadHeader.pack(method, len(payload), flags, param, compression)
+            header_bits = Steganography._to_bits(header)
+            payload_bits = Steganography._to_bits(payload)
+            message_length = header_bits.size + payload_bits.size
+            touched = header_bits.size + -(-payload_bits.size // param) * group
             
+            # PVD capacity depends on content, _encode_pvd checks its own
             max_bytes = img.shape[0] * img.shape[1] * 3
-            if message_length > max_bytes:
-                raise ValueError(f"Message too large. Max {max_bytes // 8} characters")
+            capacity_bits = HEADER_BITS + (max_bytes - HEADER_BITS) // group * param
+            if touched > max_bytes and method != 'PVD':
+                raise ValueError(f"Message too large. Max {(capacity_bits - HEADER_BITS) // 8} characters")
             
-            if method == 'LSB':
-                img = Steganography._encode_lsb(img, binary_message)
+            # The header always sits in the first channel values so any
+            # decoder can read it with plain LSB before knowing the method.
+            if key is not None:
+                img = Steganography._encode_lsb(img, header_bits)
+                positions = Steganography._keyed_positions(img, key, touched - HEADER_BITS, workers)
+                flat = img.reshape(-1)
+                if method == 'LSB':
+                    flat[positions] = Steganography._encode_lsb(flat[positions], payload_bits, k,
+                                                                workers=workers)
+                elif method == 'MATRIX':
+                    flat[positions] = Steganography._encode_matrix(flat[positions], payload_bits,
+                                                                   matrix_p, workers)
+                else:
+                    flat[positions] = Steganography._encode_lsb_match(flat[positions], payload_bits,
+                                                                      rng, workers)
+                touched = np.concatenate([np.arange(HEADER_BITS), positions])
+            elif method == 'LSB' and k == 1:
+                img = Steganography._encode_lsb(img, np.concatenate([header_bits, payload_bits]),
+                                                workers=workers)
+            elif method == 'LSB':
+                img = Steganography._encode_lsb(img, header_bits)
+                img = Steganography._encode_lsb(img, payload_bits, k, HEADER_BITS, workers)
             elif method == 'LSB_MATCH':
-                img = Steganography._encode_lsb_match(img, binary_message)
+                img = Steganography._encode_lsb_match(img, np.concatenate([header_bits, payload_bits]),
+                                                      rng, workers)
+            elif method == 'MATRIX':
+                img = Steganography._encode_lsb(img, header_bits)
+                flat = img.reshape(-1)
+                flat[HEADER_BITS:touched] = Steganography._encode_matrix(flat[HEADER_BITS:touched],
+                                                                         payload_bits, matrix_p, workers)
             elif method == 'PVD':
-                img = Steganography._encode_pvd(img, binary_message)
+                img = Steganography._encode_lsb(img, header_bits)
+                region = Steganography._pvd_region(img)
+                touched = img.size - region.size + Steganography._encode_pvd(region, payload_bits, workers)
             
-            cv2.imwrite(output_path, img, [cv2.IMWRITE_PNG_COMPRESSION, 0])
-            
-            return {
+            result = {
                 'success': True,
-                'message_length': len(message) - 9,
+                'image': img if output_ext is None else ImageIO.encode(img, output_ext),
+                'message_length': len(message) if isinstance(message, str) else len(payload),
                 'image_size': img.shape,
-                'capacity_used': (message_length / max_bytes) * 100,
+                'capacity_used': (message_length / capacity_bits) * 100,
                 'method': method
             }
-            
+            if metrics:
+                result.update(Steganography._embed_metrics(cover, img, touched))
+            return result
+        
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
     @staticmethod
-    def _encode_lsb(img, binary_message):
-        """Standard LSB encoding"""
-        data_index = 0
-        for i in range(img.shape[0]):
-            for j in range(img.shape[1]):
-                for k in range(3):
-                    if data_index < len(binary_message):
-                        img[i, j, k] = (img[i, j, k] & 0xFE) | int(binary_message[data_index])
-                        data_index += 1
-                    else:
-                        return img
+    def _embed_metrics(cover, stego, touched) -> dict:
+        """PSNR, MSE and changed-pixel count over the touched values only
+        
+        touched is either a count of leading values or an array of flat indices.
+        """
+        if isinstance(touched, np.ndarray):
+            diff = stego.reshape(-1)[touched].astype(np.int32) - cover.reshape(-1)[touched]
+            changed_pixels = np.unique(touched[diff != 0] // 3).size
+        else:
+            touched = min(-(-touched // 3) * 3, cover.size)
+            diff = stego.reshape(-1)[:touched].astype(np.int32) - cover.reshape(-1)[:touched]
+            changed_pixels = np.count_nonzero(diff.reshape(-1, 3).any(axis=1))
+        
+        mse = float(np.dot(diff, diff)) / cover.size
+        psnr = float('inf') if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse))
+        
+        return {
+            'psnr': psnr,
+            'mse': mse,
+            'changed_pixels': int(changed_pixels)
+        }
+    
+    @staticmethod
+    def _to_payload(message) -> tuple:
+        """Normalize str/bytes/memoryview/PayloadStream input into (payload, header flags)"""
+        if isinstance(message, str):
+            return memoryview(message.encode('utf-8')), 0
+        if isinstance(message, (bytes, bytearray, memoryview)):
+            return memoryview(message).cast('B'), FLAG_BINARY
+        if isinstance(message, PayloadStream):
+            return message, FLAG_BINARY
+        raise TypeError("Message must be str, bytes, memoryview or PayloadStream")
+    
+    @staticmethod
+    def _to_bits(data) -> np.ndarray:
+        """Unpack a bytes-like object or PayloadStream into a uint8 array of bits, MSB first"""
+        if isinstance(data, PayloadStream):
+            return BitReader(data).read(len(data) * 8)
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    
+    @staticmethod
+    def _keyed_positions(img, key, count: int, workers: int = 1) -> np.ndarray:
+        """Flat indices of the first count keyed positions after the header"""
+        if count > img.size - HEADER_BITS:
+            raise ValueError("Payload length exceeds image capacity")
+        permutation = KeyedPermutation(key, img.size - HEADER_BITS)
+        tiles = Steganography._run_tiles(lambda a, b: permutation.positions(b - a, a), count, workers)
+        return HEADER_BITS + np.concatenate(tiles)
+    
+    @staticmethod
+    def _run_tiles(func, total: int, workers: int = 1) -> list:
+        """Call func(start, stop) over contiguous tiles of range(total), results in tile order
+        
+        With workers > 1 the tiles run in a thread pool; NumPy releases the
+        GIL inside the per-tile work. Tiles never overlap, so the result does
+        not depend on the worker count.
+        """
+        if workers <= 1 or total < 2 * MIN_TILE_VALUES:
+            return [func(0, total)]
+        
+        tile = max(-(-total // workers), MIN_TILE_VALUES)
+        bounds = [(start, min(start + tile, total)) for start in range(0, total, tile)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda bound: func(*bound), bounds))
+    
+    @staticmethod
+    def _encode_lsb(img, bits, k=1, start=0, workers=1):
+        """Standard LSB encoding, vectorized over the channel values from start
+        
+        With k > 1 the k low bits of each value are replaced, MSB first.
+        """
+        img = np.ascontiguousarray(img)
+        flat = img.reshape(-1)[start:]
+        n = min(-(-bits.size // k), flat.size)
+        
+        def embed(a, b):
+            if k == 1:
+                flat[a:b] = (flat[a:b] & 0xFE) | bits[a:b]
+                return
+            
+            chunk = bits[a * k:b * k]
+            groups = np.zeros((b - a, k), dtype=np.uint8)
+            groups.reshape(-1)[:chunk.size] = chunk
+            values = flat[a:b] & (0xFF ^ ((1 << k) - 1))
+            for j in range(k):
+                values |= groups[:, j] << (k - 1 - j)
+            flat[a:b] = values
+        
+        Steganography._run_tiles(embed, n, workers)
         return img
     
     @staticmethod
-    def _encode_lsb_match(img, binary_message):
-        """LSB Matching"""
-        data_index = 0
-        for i in range(img.shape[0]):
-            for j in range(img.shape[1]):
-                for k in range(3):
-                    if data_index < len(binary_message):
-                        pixel_val = int(img[i, j, k])
-                        bit = int(binary_message[data_index])
-                        
-                        if pixel_val % 2 != bit:
-                            change = random.choice([-1, 1])
-                            new_val = max(0, min(255, pixel_val + change))
-                            img[i, j, k] = new_val
-                        
-                        data_index += 1
-                    else:
-                        return img
+    def _encode_lsb_match(img, bits, rng=None, workers=1):
+        """LSB Matching, vectorized with +/-1 steps drawn from a NumPy Generator"""
+        if rng is None:
+            rng = np.random.default_rng()
+        
+        img = np.ascontiguousarray(img)
+        flat = img.reshape(-1)
+        n = min(bits.size, flat.size)
+        values = flat[:n]
+        
+        # Steps are drawn in one call, in raster order, so the generator is
+        # consumed the same way whatever the worker count
+        mismatch = np.concatenate(Steganography._run_tiles(
+            lambda a, b: a + np.flatnonzero((values[a:b] & 1) != bits[a:b]), n, workers))
+        steps = rng.integers(0, 2, size=mismatch.size, dtype=np.int16) * 2 - 1
+        
+        def step(a, b):
+            index = mismatch[a:b]
+            targets = values[index].astype(np.int16)
+            tile_steps = steps[a:b]
+            # Stepping off the 0..255 range would clip back onto the wrong parity
+            tile_steps[targets == 0] = 1
+            tile_steps[targets == 255] = -1
+            values[index] = (targets + tile_steps).astype(np.uint8)
+        
+        Steganography._run_tiles(step, mismatch.size, workers)
         return img
     
     @staticmethod
-    def _encode_pvd(img, binary_message):
-        """Pixel Value Differencing"""
-        data_index = 0
-        for i in range(0, img.shape[0] - 1, 2):
-            for j in range(0, img.shape[1] - 1, 2):
-                if data_index >= len(binary_message):
-                    return img
-                
-                diff = abs(int(img[i, j, 0]) - int(img[i+1, j, 0]))
+    def _encode_matrix(values, bits, p, workers=1):
+        """Hamming (1, 2^p - 1, p) matrix embedding over a flat array of values
+        
+        Each block of n = 2^p - 1 values carries p bits as its syndrome, the
+        XOR of the 1-based indices of its odd values. Flipping the LSB of
+        value s XOR m turns syndrome s into message m, so at most one value
+        per block changes.
+        """
+        n = (1 << p) - 1
+        blocks = -(-bits.size // p)
+        values = np.ascontiguousarray(values)
+        
+        groups = np.zeros((blocks, p), dtype=np.uint8)
+        groups.reshape(-1)[:bits.size] = bits
+        message = np.zeros(blocks, dtype=np.uint8)
+        for j in range(p):
+            message |= groups[:, j] << (p - 1 - j)
+        
+        def embed(a, b):
+            block = values[a * n:b * n].reshape(b - a, n)
+            flip = Steganography._matrix_syndromes(block) ^ message[a:b]
+            rows = np.flatnonzero(flip)
+            block[rows, flip[rows] - 1] ^= 1
+        
+        Steganography._run_tiles(embed, blocks, workers)
+        return values
+    
+    @staticmethod
+    def _matrix_syndromes(block):
+        """Syndrome of every row of a (blocks, 2^p - 1) array of values"""
+        n = block.shape[1]
+        if n > 15:
+            columns = np.arange(1, n + 1, dtype=np.uint8)
+            return np.bitwise_xor.reduce((block & 1) * columns, axis=1)
+        
+        # Reducing along a short axis is slow, accumulate column by column instead
+        syndromes = np.zeros(block.shape[0], dtype=np.uint8)
+        for j in range(n):
+            syndromes ^= (block[:, j] & 1) * np.uint8(j + 1)
+        return syndromes
+    
+    @staticmethod
+    def _pvd_region(img):
+        """View of the rows below the header, where PVD pairs live"""
+        header_rows = -(-HEADER_BITS // (img.shape[1] * 3))
+        return img[header_rows:]
+    
+    @staticmethod
+    def _pvd_chunks(region, n_bits):
+        """Yield the pair chunks of region that hold the first n_bits, in embedding order
+        
+        Pairs are horizontal same-channel pixel pairs in (row, pair, channel)
+        order, taken a few rows at a time so that work arrays stay bounded by
+        PVD_CHUNK_PAIRS and capacity is only looked up as far as the payload
+        reaches. Yields (row, pairs, p1, p2, n, starts): the first row, the
+        (rows, w/2, 2, 3) pair array, both pixels of every pair as int16,
+        and the bit count and first bit offset of the pairs that carry bits.
+        """
+        width = region.shape[1] - region.shape[1] % 2
+        row_pairs = width // 2 * 3
+        offset = 0
+        row = 0
+        while offset < n_bits:
+            if row >= region.shape[0] or row_pairs == 0:
+                raise ValueError(f"Message too large. Max {offset // 8} bytes for PVD")
+            
+            # Usable pairs carry at least 3 bits; saturated rows just take another pass
+            rows = -(-(n_bits - offset) // (int(PVD_BITS.min()) * row_pairs))
+            rows = min(max(rows, 1), max(PVD_CHUNK_PAIRS // row_pairs, 1), region.shape[0] - row)
+            pairs = region[row:row + rows, :width].reshape(rows, width // 2, 2, 3)
+            p1 = pairs[:, :, 0, :].reshape(-1).astype(np.int16)
+            p2 = pairs[:, :, 1, :].reshape(-1).astype(np.int16)
+            n = PVD_CAPACITY[p1, p2]
+            ends = offset + np.cumsum(n, dtype=np.int64)
+            if ends[-1] >= n_bits:
+                count = int(np.searchsorted(ends, n_bits)) + 1
+                n, ends = n[:count], ends[:count]
+            
+            yield row, pairs, p1, p2, n, ends - n
+            offset = int(ends[-1])
+            row += rows
+    
+    @staticmethod
+    def _pvd_capacity(img) -> int:
+        """Exact PVD payload bytes of a cover, summed from its pixel pairs"""
+        region = Steganography._pvd_region(img)
+        width = region.shape[1] - region.shape[1] % 2
+        rows = max(PVD_CHUNK_PAIRS // max(width // 2 * 3, 1), 1)
+        total = 0
+        for row in range(0, region.shape[0], rows):
+            pairs = region[row:row + rows, :width].reshape(-1, width // 2, 2, 3)
+            total += int(PVD_CAPACITY[pairs[:, :, 0, :], pairs[:, :, 1, :]].sum(dtype=np.int64))
+        return total // 8
+    
+    @staticmethod
+    def _encode_pvd(img, bits, workers=1):
+        """Wu-Tsai Pixel Value Differencing over horizontal pixel pairs
+        
+        Works in place, chunk by chunk, and returns how many leading values
+        of img (in flat order) may have changed.
+        """
+        padded = np.zeros(bits.size + PVD_MAX_BITS, dtype=np.uint8)
+        padded[:bits.size] = bits
+        j = np.arange(PVD_MAX_BITS, dtype=np.int32)
+        touched = 0
+        
+        for row, pairs, p1, p2, n, starts in Steganography._pvd_chunks(img, bits.size):
+            # Bit offsets relative to the chunk keep the gather index in int32
+            chunk_bits = padded[starts[0]:]
+            local = (starts - starts[0]).astype(np.int32)
+            
+            def embed(a, b):
+                # Gather each pair's n bits (MSB first) into one value
+                values = (chunk_bits[local[a:b, None] + j] * PVD_WEIGHTS[n[a:b]]).sum(
+                    axis=1, dtype=np.int16)
+                d = p2[a:b] - p1[a:b]
+                new_d = PVD_LOWER[PVD_RANGE[np.abs(d)]] + values
+                new_d = np.where(d < 0, -new_d, new_d)
+                new_p1, new_p2 = _pvd_adjust(p1[a:b], p2[a:b], d, new_d)
                 
-                if diff >= 8:
-                    bits_to_embed = min(3, len(binary_message) - data_index)
-                    embed_value = int(binary_message[data_index:data_index+bits_to_embed], 2)
-                    img[i, j, 0] = (img[i, j, 0] & 0xF8) | embed_value
-                    data_index += bits_to_embed
-        return img
+                used = np.flatnonzero(n[a:b])
+                p1[a + used] = new_p1[used]
+                p2[a + used] = new_p2[used]
+            
+            Steganography._run_tiles(embed, n.size, workers)
+            
+            # pairs is a copy when the width is odd, so always write back
+            rows, half = pairs.shape[:2]
+            pairs[:, :, 0, :] = p1.reshape(rows, half, 3)
+            pairs[:, :, 1, :] = p2.reshape(rows, half, 3)
+            img[row:row + rows, :half * 2] = pairs.reshape(rows, half * 2, 3)
+            touched = (row + (n.size - 1) // (half * 3) + 1) * img.shape[1] * 3
+        
+        return touched
     
     @staticmethod
-    def decode_message(image_path: str) -> dict:
-        """Decode message from image"""
-        try:
-            img = cv2.imread(image_path)
-            if img is None:
-                raise ValueError("Could not read image")
-            
-            binary_data = ""
-            for i in range(img.shape[0]):
-                for j in range(img.shape[1]):
-                    for k in range(3):
-                        binary_data += str(img[i, j, k] & 1)
-            
-            message = ""
-            for i in range(0, len(binary_data), 8):
-                byte = binary_data[i:i+8]
-                if len(byte) == 8:
-                    char = chr(int(byte, 2))
-                    message += char
-                    
-                    if message.endswith("<<<END>>>"):
-                        message = message[:-9]
-                        return {
-                            'success': True,
-                            'message': message,
-                            'length': len(message)
-                        }
-            
-            raise ValueError("No valid message found")
+    def _decode_pvd(img, header, key=None, workers=1):
+        """Extract the payload written by _encode_pvd"""
+        n_bits = header['length'] * 8
+        region = Steganography._pvd_region(img)
+        # The header is unauthenticated, bound its length before allocating
+        if n_bits > region.shape[0] * (region.shape[1] // 2) * 3 * PVD_MAX_BITS:
+            raise ValueError("Payload length exceeds image capacity")
+        bits = np.empty(n_bits + PVD_MAX_BITS, dtype=np.uint8)
+        
+        for _, _, p1, p2, n, starts in Steganography._pvd_chunks(region, n_bits):
+            d = np.abs(p2[:n.size] - p1[:n.size])
+            values = d - PVD_LOWER[PVD_RANGE[d]]
+            
+            def extract(a, b):
+                stop = starts[b - 1] + n[b - 1]
+                bits[starts[a]:stop] = ((values[a:b, None] >> PVD_SHIFTS[n[a:b]]) & 1)[PVD_IN_PAIR[n[a:b]]]
             
+            Steganography._run_tiles(extract, n.size, workers)
+        
+        return bits[:n_bits]
+    
+    @staticmethod
+    def decode_message(image_path: str, key=None, workers: int = 1) -> dict:
+        """Decode message from image or WAV carrier, detecting the embedding method"""
+        try:
+            audio = Steganography._audio_carrier(image_path)
+            if audio is not None:
+                Steganography._audio_options({'key': key})
+                return audio.decode_message(image_path, workers)
+            return Steganography.decode_array(ImageIO.read(image_path), key, workers)
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
     @staticmethod
-    def get_image_capacity(image_path: str) -> dict:
-        """Calculate maximum message capacity"""
+    def decode_array(image, key=None, workers: int = 1) -> dict:
+        """Decode message from an ndarray or encoded image bytes
+        
+        key is required when the payload was scattered with one. workers > 1
+        extracts tiles of the payload region in a thread pool.
+        """
         try:
-            img = cv2.imread(image_path)
-            if img is None:
-                raise ValueError("Could not read image")
+            img = ImageIO.load(image)
+            flat = img.reshape(-1)
+            header = PayloadHeader.unpack(np.packbits(flat[:HEADER_BITS] & 1).tobytes())
+            
+            if header is None:
+                method, data = Steganography._decode_legacy(img)
+                message = data.decode('latin-1')
+                compression = 'none'
+            else:
+                method, compression = header['method'], header['compression']
+                extractor = getattr(Steganography, EXTRACTORS[method])
+                bits = extractor(img, header, key, workers)
+                data = np.packbits(bits).tobytes()
+                message = None if header['flags'] & FLAG_BINARY else data.decode('utf-8')
             
-            max_bits = img.shape[0] * img.shape[1] * 3
-            max_chars = max_bits // 8 - 9
+            result = {
+                'success': True,
+                'message': message,
+                'data': data,
+                'length': len(data) if message is None else len(message),
+                'method': method,
+                'compression': compression
+            }
+            # Shards are raw slices of a larger payload, PayloadSharding joins them
+            if header is not None and header['flags'] & FLAG_SHARDED:
+                result['shard'] = ShardHeader.unpack(data)
+                result['data'] = data[SHARD_HEADER_SIZE:]
+                result['length'] = len(result['data'])
+            return result
+        
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def _payload_values(img, header, count: int, key=None, workers=1):
+        """The count values after the header that carry the payload, in embedding order"""
+        flat = img.reshape(-1)
+        if header['flags'] & FLAG_SCATTERED:
+            if key is None:
+                raise ValueError("Message was hidden with a key, please provide it")
+            return flat[Steganography._keyed_positions(img, key, count, workers)]
+        if HEADER_BITS + count > flat.size:
+            raise ValueError("Payload length exceeds image capacity")
+        return flat[HEADER_BITS:HEADER_BITS + count]
+    
+    @staticmethod
+    def _decode_lsb(img, header, key=None, workers=1):
+        """Extract the payload written after the header by _encode_lsb or _encode_lsb_match"""
+        n_bits, k = header['length'] * 8, header['param']
+        values = Steganography._payload_values(img, header, -(-n_bits // k), key, workers)
+        return Steganography._extract_lsb(values, k, workers)[:n_bits]
+    
+    @staticmethod
+    def _extract_lsb(values, k=1, workers=1):
+        """The k low bits of every value, MSB first, as a flat array of bits"""
+        bits = np.empty((values.size, k), dtype=np.uint8)
+        
+        def extract(a, b):
+            for j in range(k):
+                bits[a:b, j] = (values[a:b] >> (k - 1 - j)) & 1
+        
+        Steganography._run_tiles(extract, values.size, workers)
+        return bits.reshape(-1)
+    
+    @staticmethod
+    def _decode_matrix(img, header, key=None, workers=1):
+        """Extract the payload written by _encode_matrix"""
+        n_bits, p = header['length'] * 8, header['param']
+        n = (1 << p) - 1
+        blocks = -(-n_bits // p)
+        values = Steganography._payload_values(img, header, blocks * n, key, workers)
+        bits = np.empty((blocks, p), dtype=np.uint8)
+        
+        def extract(a, b):
+            syndromes = Steganography._matrix_syndromes(values[a * n:b * n].reshape(b - a, n))
+            for j in range(p):
+                bits[a:b, j] = (syndromes >> (p - 1 - j)) & 1
+        
+        Steganography._run_tiles(extract, blocks, workers)
+        return bits.reshape(-1)[:n_bits]
+    
+    @staticmethod
+    def _decode_legacy(img) -> tuple:
+        """Probe every legacy extractor, returns (method, data) of the first hit
+        
+        With several extractors registered the probes run concurrently.
+        """
+        streams = {name: getattr(Steganography, extractor)(img)
+                   for name, extractor in LEGACY_EXTRACTORS.items()}
+        
+        def probes():
+            if len(streams) == 1:
+                name, stream = next(iter(streams.items()))
+                yield name, Steganography._probe_legacy(stream)
+                return
+            with ThreadPoolExecutor(max_workers=len(streams)) as pool:
+                futures = {pool.submit(Steganography._probe_legacy, stream): name
+                           for name, stream in streams.items()}
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+        
+        for name, prefix in probes():
+            if prefix is None:
+                continue
+            data = Steganography._extract_until(streams[name], END_MARKER, prefix)
+            if data is not None:
+                return name, data
+        
+        raise ValueError("No valid message found")
+    
+    @staticmethod
+    def _probe_legacy(stream):
+        """Read one chunk from stream, returns it if it looks like sentinel-terminated text
+        
+        A marker at index 0 is an empty legacy message and counts as a hit.
+        """
+        prefix = next(stream, b"")
+        index = prefix.find(END_MARKER)
+        if index == 0:
+            return prefix
+        text = prefix if index == -1 else prefix[:index]
+        
+        if not text or any(byte < 32 and byte not in b"\t\n\r" for byte in text):
+            return None
+        return prefix
+    
+    @staticmethod
+    def _stream_legacy_lsb(img, chunk_bytes: int = EXTRACT_CHUNK_BYTES):
+        """Yield the packed LSBs of img chunk by chunk"""
+        flat = img.reshape(-1)
+        chunk_bits = chunk_bytes * 8
+        usable = flat.size - flat.size % 8
+        
+        for start in range(0, usable, chunk_bits):
+            stop = min(start + chunk_bits, usable)
+            yield np.packbits(flat[start:stop] & 1).tobytes()
+    
+    @staticmethod
+    def _extract_until(stream, marker: bytes, prefix: bytes = b""):
+        """Consume stream chunk by chunk and stop at the first chunk containing marker"""
+        buffer = bytearray(prefix)
+        index = buffer.find(marker)
+        
+        for chunk in stream:
+            if index != -1:
+                break
+            search_from = max(0, len(buffer) - len(marker) + 1)
+            buffer += chunk
+            index = buffer.find(marker, search_from)
+        
+        return None if index == -1 else bytes(buffer[:index])
+    
+    @staticmethod
+    def get_image_capacity(image_path: str, bits_per_channel: int = 1,
+                           matrix_p: int = DEFAULT_MATRIX_P) -> dict:
+        """Calculate maximum message capacity from the image header alone"""
+        try:
+            width, height = ImageIO.probe_size(image_path)
+            capacity = Steganography._capacity_for_size(width, height, bits_per_channel, matrix_p)
             
             return {
                 'success': True,
-                'max_characters': max_chars,
-                'image_dimensions': f"{img.shape[1]}x{img.shape[0]}",
-                'file_size': f"{img.nbytes / 1024:.2f} KB"
+                'max_characters': capacity['LSB'],
+                'capacity': capacity,
+                'image_dimensions': f"{width}x{height}",
+                'file_size': f"{width * height * 3 / 1024:.2f} KB"
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def get_image_capacities(image_paths, workers: int = 8, **params) -> dict:
+        """Probe many files at once, returns {path: get_image_capacity result}"""
+        probe = lambda path: Steganography.get_image_capacity(path, **params)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(image_paths, pool.map(probe, image_paths)))
+    
+    @staticmethod
+    def _capacity_for_size(width: int, height: int, bits_per_channel: int = 1,
+                           matrix_p: int = DEFAULT_MATRIX_P) -> dict:
+        """Payload bytes per method for a width x height BGR cover
+        
+        PVD capacity depends on pixel content: the figure given assumes 3
+        bits per pair, but pairs too close to 0 or 255 carry none, so
+        saturated covers hold less. _pvd_capacity gives the exact figure.
+        """
+        values = max(width * height * 3 - HEADER_BITS, 0)
+        header_rows = -(-HEADER_BITS // (width * 3))
+        pvd_pairs = max(height - header_rows, 0) * (width // 2) * 3
+        
+        return {
+            'LSB': values * bits_per_channel // 8,
+            'LSB_MATCH': values // 8,
+            'PVD': pvd_pairs * int(PVD_BITS.min()) // 8,
+            'MATRIX': values // ((1 << matrix_p) - 1) * matrix_p // 8
+        }
+    
     @staticmethod
     def calculate_psnr(original_path: str, stego_path: str) -> float:
         """Calculate Peak Signal-to-Noise Ratio"""
-        original = cv2.imread(original_path)
-        stego = cv2.imread(stego_path)
+        return Steganography.psnr_array(ImageIO.read(original_path), ImageIO.read(stego_path))
+    
+    @staticmethod
+    def psnr_array(original, stego) -> float:
+        """Calculate Peak Signal-to-Noise Ratio between two in-memory images"""
+        original = ImageIO.load(original)
+        stego = ImageIO.load(stego)
         
-        mse = np.mean((original - stego) ** 2)
+        mse = np.mean((original.astype(np.float64) - stego) ** 2)
         if mse == 0:
             return float('inf')
         
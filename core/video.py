@@ -0,0 +1,197 @@
+"""Video carrier - hide a payload across the frames of a losslessly coded video"""
+
+import os
+from itertools import chain
+
+import cv2
+import numpy as np
+
+from core.payload import PayloadHeader, BitReader, HEADER_BITS, FLAG_BINARY
+from core.steganography import Steganography, MAX_BITS_PER_CHANNEL
+
+# Lossless codecs for the stego video, by name. Use an .mkv or .avi output
+# path; lossy codecs would destroy the LSBs.
+VIDEO_CODECS = {
+    'ffv1': 'FFV1',
+    'huffyuv': 'HFYU',
+    'png': 'png '
+}
+DEFAULT_FPS = 25.0
+
+
+class VideoCarrier:
+    """LSB embedding over video frames, streamed one frame at a time"""
+    
+    @staticmethod
+    def encode_message(video_path: str, message, output_path: str, codec: str = 'ffv1',
+                       bits_per_channel: int = 1, workers: int = 1,
+                       compression: str = 'none') -> dict:
+        """Encode a text message, binary payload or PayloadStream into the frames of a video
+        
+        The payload header sits in the first values of frame 0 and the
+        payload runs on through the frames in raster order; later frames
+        are copied unchanged. Frames with an odd width or height lose their
+        last column or row. Frames flow through a generator pipeline, so
+        only the frame being embedded is held in memory.
+        """
+        try:
+            k = bits_per_channel
+            if k not in range(1, MAX_BITS_PER_CHANNEL + 1):
+                raise ValueError(f"bits_per_channel must be 1-{MAX_BITS_PER_CHANNEL}")
+            if codec not in VIDEO_CODECS:
+                raise ValueError(f"Unknown video codec: {codec}")
+            
+            payload, flags = Steganography._to_payload(message)
+            header = PayloadHeader.pack('LSB', len(payload), flags, k, compression)
+            
+            capture = VideoCarrier._open(video_path)
+            fps = capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+            frames = VideoCarrier._embed_frames(VideoCarrier._read_frames(capture),
+                                                Steganography._to_bits(header), payload, k, workers)
+            
+            writer = None
+            written = 0
+            try:
+                for frame in frames:
+                    if writer is None:
+                        fourcc = cv2.VideoWriter_fourcc(*VIDEO_CODECS[codec])
+                        writer = cv2.VideoWriter(output_path, fourcc, fps,
+                                                 (frame.shape[1], frame.shape[0]))
+                        if not writer.isOpened():
+                            raise ValueError(f"Could not open a {codec} writer for {output_path}")
+                        frame_values = frame.size
+                    writer.write(frame)
+                    written += 1
+            except Exception:
+                if writer is not None:
+                    writer.release()
+                    writer = None
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                raise
+            finally:
+                frames.close()
+                if writer is not None:
+                    writer.release()
+            
+            return {
+                'success': True,
+                'output_path': output_path,
+                'frames': written,
+                'message_length': len(message) if isinstance(message, str) else len(payload),
+                'capacity_used': (HEADER_BITS + len(payload) * 8) / (written * frame_values * k) * 100,
+                'method': 'LSB'
+            }
+        
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def decode_message(video_path: str, workers: int = 1) -> dict:
+        """Decode a message written by encode_message, streaming frame by frame"""
+        try:
+            header, chunks = VideoCarrier.stream_payload(video_path, workers)
+            data = b"".join(chunks)
+            message = None if header['flags'] & FLAG_BINARY else data.decode('utf-8')
+            return {
+                'success': True,
+                'message': message,
+                'data': data,
+                'length': len(data) if message is None else len(message),
+                'method': header['method'],
+                'compression': header['compression']
+            }
+        
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def stream_payload(video_path: str, workers: int = 1) -> tuple:
+        """Read the header now and return (header, generator of payload byte chunks)
+        
+        Frames are decoded as the generator is consumed, one chunk per frame,
+        e.g. straight into StreamEncryption.decrypt.
+        """
+        frames = VideoCarrier._read_frames(VideoCarrier._open(video_path))
+        first = next(frames, None)
+        if first is None:
+            raise ValueError("Video has no frames")
+        header = PayloadHeader.unpack(np.packbits(first.reshape(-1)[:HEADER_BITS] & 1).tobytes())
+        if header is None or header['method'] != 'LSB':
+            frames.close()
+            raise ValueError("No valid message found")
+        
+        def chunks():
+            k, n_bits = header['param'], header['length'] * 8
+            pending = np.empty(0, dtype=np.uint8)
+            extracted = 0
+            try:
+                for frame, start in chain([(first, HEADER_BITS)], ((frame, 0) for frame in frames)):
+                    if extracted >= n_bits:
+                        break
+                    flat = frame.reshape(-1)
+                    count = min(flat.size - start, -(-(n_bits - extracted) // k))
+                    bits = Steganography._extract_lsb(flat[start:start + count], k, workers)
+                    bits = bits[:n_bits - extracted]
+                    extracted += bits.size
+                    
+                    # Carry bits that do not fill a byte over to the next frame
+                    bits = np.concatenate([pending, bits])
+                    usable = bits.size - bits.size % 8
+                    pending = bits[usable:]
+                    yield np.packbits(bits[:usable]).tobytes()
+            finally:
+                frames.close()
+            
+            if extracted < n_bits:
+                raise ValueError("Video ended before the end of the payload")
+        
+        return header, chunks()
+    
+    @staticmethod
+    def _open(video_path: str):
+        """Open video_path for reading"""
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            raise ValueError("Could not read video")
+        return capture
+    
+    @staticmethod
+    def _read_frames(capture):
+        """Yield BGR frames until the video ends, then release the capture"""
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    return
+                yield frame
+        finally:
+            capture.release()
+    
+    @staticmethod
+    def _embed_frames(frames, header_bits, payload, k, workers):
+        """Yield frames with the payload embedded, unpacking only the bits each frame takes"""
+        n_bits = len(payload) * 8
+        reader = BitReader(payload)
+        offset = 0
+        index = -1
+        for index, frame in enumerate(frames):
+            # The writer drops an odd last row or column, so never embed there
+            frame = np.ascontiguousarray(frame[:frame.shape[0] & ~1, :frame.shape[1] & ~1])
+            start = 0
+            if index == 0:
+                if frame.size < HEADER_BITS:
+                    raise ValueError("Frames are too small for the payload header")
+                frame = Steganography._encode_lsb(frame, header_bits)
+                start = HEADER_BITS
+            if offset < n_bits:
+                count = min((frame.size - start) * k, n_bits - offset)
+                bits = reader.read(count)
+                frame = Steganography._encode_lsb(frame, bits, k, start, workers)
+                offset += count
+            yield frame
+        
+        if index == -1:
+            raise ValueError("Video has no frames")
+        if offset < n_bits:
+            raise ValueError(f"Message too large. Max {offset // 8} bytes in this video")
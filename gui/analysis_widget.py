@@ -129,7 +129,7 @@ class AnalysisWidget(QWidget):
             self,
             "Select Image to Analyze",
             "",
-            "Images (*.png *.jpg *.jpeg *.bmp);;All Files (*)"
+            "Images (*.png *.jpg *.jpeg *.bmp *.webp *.tif *.tiff);;All Files (*)"
         )
         
         if filename:
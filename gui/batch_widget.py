@@ -11,6 +11,7 @@ import os
 
 from core.steganography import Steganography
 from core.encryption import PasswordEncryption
+from core.compression import PayloadCompression
 from config import *
 
 
@@ -29,9 +30,12 @@ class BatchProcessThread(QThread):
     def run(self):
         """Process files"""
         success = 0
+        codec, packed = PayloadCompression.compress(self.message.encode('utf-8'))
+        # One key derivation for the whole batch
+        session = PasswordEncryption.session(self.password)
         for idx, file_path in enumerate(self.files):
             try:
-                encrypted_msg = PasswordEncryption.encrypt_message(self.message, self.password)
+                encrypted_msg = session.encrypt_message(packed)
                 output_path = os.path.join(
                     OUTPUT_DIR,
                     f"batch_{Path(file_path).stem}_{idx}.png"
@@ -41,7 +45,8 @@ class BatchProcessThread(QThread):
                     file_path,
                     encrypted_msg,
                     output_path,
-                    method=self.algorithm
+                    method=self.algorithm,
+                    compression=codec
                 )
                 
                 if result['success']:
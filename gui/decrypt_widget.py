@@ -9,6 +9,7 @@ import os
 
 from core.steganography import Steganography
 from core.encryption import PasswordEncryption
+from core.compression import PayloadCompression
 from config import *
 
 
@@ -178,7 +179,7 @@ class DecryptWidget(QWidget):
             self,
             "Select Encrypted Image",
             start_dir,
-            "Images (*.png *.jpg *.jpeg *.bmp);;All Files (*)"
+            "Images (*.png *.jpg *.jpeg *.bmp *.webp *.tif *.tiff);;All Files (*)"
         )
         
         if filename:
@@ -221,11 +222,11 @@ class DecryptWidget(QWidget):
                 QMessageBox.critical(self, "Error", result['error'])
                 return
             
-            encrypted_msg = result['message']
-            
-            # Decrypt
+            # Decrypt (binary envelope, or base64 text from older images)
             try:
-                decrypted_msg = PasswordEncryption.decrypt_message(encrypted_msg, password)
+                packed = PasswordEncryption.decrypt_bytes(result['data'], password)
+                decrypted_msg = PayloadCompression.decompress(
+                    packed, result['compression']).decode('utf-8')
                 
                 self.message_text.setPlainText(decrypted_msg)
                 
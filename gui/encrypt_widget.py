@@ -11,6 +11,7 @@ import os
 
 from core.steganography import Steganography
 from core.encryption import PasswordEncryption
+from core.compression import PayloadCompression
 from config import *
 
 
@@ -277,8 +278,9 @@ class EncryptWidget(QWidget):
                     algo = button.property("algo_key")
                     break
             
-            # Encrypt
-            encrypted_msg = PasswordEncryption.encrypt_message(message, password)
+            # Compress, then encrypt
+            codec, packed = PayloadCompression.compress(message.encode('utf-8'))
+            encrypted_msg = PasswordEncryption.encrypt_message(packed, password)
             
             # Output path
             base_name = Path(self.selected_image).stem
@@ -292,21 +294,21 @@ class EncryptWidget(QWidget):
                 self.selected_image,
                 encrypted_msg,
                 output_path,
-                method=algo
+                method=algo,
+                metrics=True,
+                compression=codec
             )
             
             if result['success']:
-                psnr = Steganography.calculate_psnr(self.selected_image, output_path)
-                
                 QMessageBox.information(
                     self,
                     "✓ Success",
                     f"Message encrypted successfully!\n\n"
-                    f"📁 File: {os.path.basename(output_path)}\n"
+                    f"📁 File: {os.path.basename(result['output_path'])}\n"
                     f"📝 Length: {len(message):,} characters\n"
                     f"🔐 Algorithm: {STEGO_ALGORITHMS[algo]}\n"
                     f"📊 Capacity: {result['capacity_used']:.2f}%\n"
-                    f"📈 PSNR: {psnr:.2f} dB"
+                    f"📈 PSNR: {result['psnr']:.2f} dB"
                 )
                 self.clear_fields()
             else: